@@ -0,0 +1,101 @@
+### Governador de latencia: acompanha o tempo de inferencia contra o FPS alvo e, quando o
+### orcamento estoura, troca para um modelo mais leve ou passa a inferir so a cada k frames
+### (mantendo os landmarks do ultimo frame inferido nos demais)
+import threading
+
+TIERS = ["lite", "full", "heavy"]   # do mais rapido para o mais preciso
+MODEL_PATHS = {
+    "lite": "models/pose_landmarker_lite.task",
+    "full": "models/pose_landmarker_full.task",
+    "heavy": "models/pose_landmarker_heavy.task"
+}
+
+
+class LandmarkersPorTier:
+    # Cria sob demanda (e guarda) um landmarker por modelo; so fecha os que ele mesmo criou
+    def __init__(self, criar_landmarker, existentes=None):
+        self._criar = criar_landmarker
+        self._instancias = dict(existentes or {})
+        self._criados = []
+        self._lock = threading.Lock()
+
+    def obter(self, tier):
+        with self._lock:
+            if tier not in self._instancias:
+                self._instancias[tier] = self._criar(tier)
+                self._criados.append(self._instancias[tier])
+            return self._instancias[tier]
+
+    def fechar(self):
+        for landmarker in self._criados:
+            landmarker.close()
+
+
+class GovernadorLatencia:
+    # tier_max: modelo mais pesado permitido (o escolhido em --model); comeca nele.
+    # folga: fracao do orcamento abaixo da qual ha espaco para subir a qualidade.
+    # paciencia: frames seguidos fora do orcamento antes de mudar, para nao oscilar.
+    def __init__(self, fps_alvo, tier_max="heavy", max_salto=4, alpha=0.2, folga=0.6, paciencia=15):
+        self.orcamento_ms = 1000.0 / fps_alvo
+        self.tiers = TIERS[:TIERS.index(tier_max) + 1]
+        self.tier_idx = len(self.tiers) - 1
+        self.salto = 1                  # infere 1 a cada `salto` frames
+        self.max_salto = max_salto
+        self.alpha = alpha
+        self.folga = folga
+        self.paciencia = paciencia
+        # precisao_alta e ligado pela thread principal enquanto o paciente segura a pose perto
+        # do limite: forca inferencia em todo frame e congela a troca de modelo
+        self.precisao_alta = False
+        self._media_por_tier = {}
+        self._acima = 0
+        self._abaixo = 0
+        self._frames_sem_inferir = 0
+
+    @property
+    def tier(self):
+        return self.tiers[self.tier_idx]
+
+    def deve_inferir(self):
+        if self.precisao_alta or self._frames_sem_inferir + 1 >= self.salto:
+            self._frames_sem_inferir = 0
+            return True
+        self._frames_sem_inferir += 1
+        return False
+
+    def registrar(self, duracao_ms):
+        media = self._media_por_tier.get(self.tier)
+        media = duracao_ms if media is None else (1 - self.alpha) * media + self.alpha * duracao_ms
+        self._media_por_tier[self.tier] = media
+
+        # custo de inferencia amortizado por frame exibido
+        salto_efetivo = 1 if self.precisao_alta else self.salto
+        custo = media / salto_efetivo
+        if custo > self.orcamento_ms:
+            self._acima, self._abaixo = self._acima + 1, 0
+        elif custo < self.folga * self.orcamento_ms:
+            self._acima, self._abaixo = 0, self._abaixo + 1
+        else:
+            self._acima = self._abaixo = 0
+
+        if self._acima >= self.paciencia:
+            self._acima = 0
+            if not self.precisao_alta and self.tier_idx > 0:
+                self.tier_idx -= 1
+            elif self.salto < self.max_salto:
+                self.salto += 1
+        elif self._abaixo >= self.paciencia:
+            self._abaixo = 0
+            if self.salto > 1:
+                self.salto -= 1
+            elif not self.precisao_alta and self.tier_idx < len(self.tiers) - 1:
+                # so sobe se o modelo de cima nunca foi medido ou coube no orcamento
+                media_acima = self._media_por_tier.get(self.tiers[self.tier_idx + 1])
+                if media_acima is None or media_acima < self.orcamento_ms:
+                    self.tier_idx += 1
+
+    def relatorio(self):
+        media = self._media_por_tier.get(self.tier, 0.0)
+        return (f"modelo {self.tier}, inferindo 1 a cada {self.salto} frame(s), "
+                f"inferencia {media:.1f} ms (orcamento {self.orcamento_ms:.1f} ms)"
+                f"{', precisao alta' if self.precisao_alta else ''}")
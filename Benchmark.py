@@ -0,0 +1,478 @@
+### Benchmarks reprodutiveis do monitor: geometria, comparacao, desenho e composicao rodam sem
+### camera e sem modelo (landmarks sinteticos com semente fixa e as imagens de exercises_input);
+### opcionalmente mede o FPS ponta a ponta de cada modelo sobre um video gravado.
+### Os resultados podem ser salvos em JSON e comparados com uma execucao anterior.
+import argparse
+import dataclasses
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from AdaptiveInference import MODEL_PATHS, TIERS
+from DrawingUtils import Compositor, draw_skeleton, draw_skeleton_array, draw_stats
+from ExerciseStore import ExercicioCompilado
+from GeometryUtils import (TRIPLETOS, NUM_LANDMARKS, NUM_TRIPLETOS, PRESENCE_THRESHOLD, angulos_para_vetor,
+                           calcular_angulos_frame, calcular_angulos_resultado, calcular_angulos_vetor,
+                           comparar_angulos, comparar_angulos_vetor, get_media_angulos, landmarks_para_array)
+from PoseIndex import IndicePoses
+from RoiTracking import RastreadorROI
+
+DIR_IMAGENS = "exercises_input"
+EXTENSOES_IMAGEM = ('.png', '.jpg', '.jpeg')
+TOLERANCIA_REGRESSAO = 0.10   # piora relativa acima disso e marcada como regressao
+
+
+def cronometrar(funcao, repeticoes=1000, rodadas=5):
+    # melhor media (ms por chamada) entre algumas rodadas, para reduzir ruido do sistema
+    melhor = float('inf')
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        melhor = min(melhor, (time.perf_counter() - inicio) / repeticoes)
+    return melhor * 1000
+
+
+def landmarks_sinteticos(n_frames=1, semente=0):
+    # array (N, 33, 4) = [x, y, z, presence] com poses aleatorias plausiveis
+    rng = np.random.default_rng(semente)
+    pontos = rng.uniform(0.1, 0.9, size=(n_frames, NUM_LANDMARKS, 4)).astype(np.float32)
+    pontos[..., 3] = rng.uniform(0.6, 1.0, size=(n_frames, NUM_LANDMARKS))
+    return pontos
+
+
+# Mesmos campos dos landmarks do mediapipe (dataclasses em mediapipe.tasks.python.components.containers.landmark):
+# ler atributos de um dataclass custa bem diferente de um SimpleNamespace, e o monitor le os dos objetos
+@dataclasses.dataclass
+class LandmarkSintetico:
+    x: float
+    y: float
+    z: float
+    visibility: Optional[float] = None
+    presence: Optional[float] = None
+
+
+def array_para_landmarks(pontos):
+    return [LandmarkSintetico(float(p[0]), float(p[1]), float(p[2]), float(p[3]), float(p[3])) for p in pontos]
+
+
+def imagens_referencia(dir_imagens=DIR_IMAGENS):
+    # todas as imagens de referencia cadastradas; se a pasta nao existir, uma imagem sintetica
+    caminhos = sorted(os.path.join(raiz, f) for raiz, _, arquivos in os.walk(dir_imagens)
+                      for f in arquivos if f.lower().endswith(EXTENSOES_IMAGEM))
+    imagens = [img for img in (cv2.imread(c) for c in caminhos) if img is not None]
+    if not imagens:
+        rng = np.random.default_rng(0)
+        imagens = [rng.integers(0, 255, size=(1080, 1920, 3), dtype=np.uint8)]
+    return imagens
+
+
+# Implementacao original (um tripleto por vez em Python), usada como referencia
+def calcular_angulo_2d(a, b, c):    # calcula o angulo de um tripleto (angulo entre AB e CB)
+    # calcula vetores ab e cb
+    ab = (a.x - b.x, a.y - b.y)
+    cb = (c.x - b.x, c.y - b.y)
+    # calcula produto escalar: u . v = x1 * x2 + y1 * y2
+    produto_escalar = ab[0]*cb[0] + ab[1]*cb[1]
+    # norma (magnitude) dos vetores
+    norma_ab = math.hypot(*ab)
+    norma_cb = math.hypot(*cb)
+    if norma_ab == 0 or norma_cb == 0:
+        return None
+    # cos(x) = (u . v) / (|u| * |v|)      
+    cos_angulo = produto_escalar / (norma_ab * norma_cb)
+    cos_angulo = max(-1.0, min(1.0, cos_angulo)) # evita erros de arredondamento onde o cos pode ser maior que 1 ou menor que -1
+    angulo_rad = math.acos(cos_angulo)
+    return math.degrees(angulo_rad)
+
+
+def calcular_angulos_frame_python(landmarks):
+    angulos = {}
+    for a_idx, b_idx, c_idx in TRIPLETOS:
+        if landmarks[a_idx] is None or landmarks[b_idx] is None or landmarks[c_idx] is None:
+            continue
+        angulos[f"{a_idx}-{b_idx}-{c_idx}"] = calcular_angulo_2d(landmarks[a_idx], landmarks[b_idx], landmarks[c_idx])
+    return angulos
+
+
+def bench_geometria(repeticoes=2000, tamanho_lote=1000):
+    pontos_lote = landmarks_sinteticos(tamanho_lote)
+    mascara_lote = pontos_lote[..., 3] >= 0.5
+    landmarks = array_para_landmarks(pontos_lote[0])
+    pontos, mascara = landmarks_para_array(landmarks)
+
+    resultados = {
+        'angulos_frame_python': cronometrar(lambda: calcular_angulos_frame_python(landmarks), repeticoes),
+        'angulos_frame_adaptador': cronometrar(lambda: calcular_angulos_frame(landmarks), repeticoes),
+        'angulos_vetor': cronometrar(lambda: calcular_angulos_vetor(pontos, mascara), repeticoes),
+        'angulos_lote_por_frame': cronometrar(
+            lambda: calcular_angulos_vetor(pontos_lote, mascara_lote), max(1, repeticoes // 100)) / tamanho_lote,
+    }
+    return resultados
+
+
+# Resultado sintetico do landmarker com pose_landmarks e pose_world_landmarks. Os world landmarks
+# ficam em metros, centrados no quadril, como os do mediapipe.
+def resultado_sintetico(semente=3):
+    pontos = landmarks_sinteticos(1, semente=semente)[0]
+    mundo = (pontos[:, :3] - 0.5) * 0.8
+    return SimpleNamespace(
+        pose_landmarks=[array_para_landmarks(pontos)],
+        pose_world_landmarks=[[LandmarkSintetico(float(x), float(y), float(z)) for x, y, z in mundo]])
+
+
+# Caminho por frame do monitor (resultado do landmarker -> arrays -> angulos) nos modos 2d e 3d
+def bench_modos_angulo(repeticoes=2000, tamanho_lote=1000):
+    result = resultado_sintetico()
+    pontos_lote = landmarks_sinteticos(tamanho_lote, semente=4)
+    mascara_lote = pontos_lote[..., 3] >= PRESENCE_THRESHOLD
+
+    repeticoes_lote = max(1, repeticoes // 100)
+    return {
+        'resultado_2d': cronometrar(lambda: calcular_angulos_resultado(result, '2d'), repeticoes),
+        'resultado_3d': cronometrar(lambda: calcular_angulos_resultado(result, '3d'), repeticoes),
+        'lote_2d_por_frame': cronometrar(
+            lambda: calcular_angulos_vetor(pontos_lote, mascara_lote), repeticoes_lote) / tamanho_lote,
+        'lote_3d_por_frame': cronometrar(
+            lambda: calcular_angulos_vetor(pontos_lote, mascara_lote, dims=3), repeticoes_lote) / tamanho_lote,
+    }
+
+
+# Razao 3d / 2d do caminho por frame do monitor (calcular_angulos_resultado nos dois modos).
+# As rodadas alternam 2d e 3d, para que a variacao da maquina afete os dois, e a razao usada e a
+# mediana das razoes por rodada: uma rodada ruidosa isolada nao muda o resultado.
+def razao_3d_2d(repeticoes=500, rodadas=21):
+    result = resultado_sintetico()
+    razoes = []
+    for _ in range(rodadas):
+        tempos = []
+        for modo in ('2d', '3d'):
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                calcular_angulos_resultado(result, modo)
+            tempos.append(time.perf_counter() - inicio)
+        razoes.append(tempos[1] / tempos[0])
+    return statistics.median(razoes)
+
+
+# O modo 3d precisa caber no orcamento por frame do caminho 2d atual (com a mesma tolerancia
+# das regressoes). Ligar os TRIPLETOS_EXTRAS no 3d (MODOS_EXTRAS) estoura esse orcamento.
+def verificar_orcamento_3d(razao, tolerancia=TOLERANCIA_REGRESSAO):
+    dentro = razao <= 1 + tolerancia
+    print(f"\n3D / 2D por frame (mediana de rodadas alternadas): {razao:.2f}x "
+          f"({'dentro do' if dentro else 'ACIMA do'} orçamento de {1 + tolerancia:.2f}x)")
+    return dentro
+
+
+def bench_comparacao(repeticoes=2000):
+    frames = [calcular_angulos_frame(array_para_landmarks(p)) for p in landmarks_sinteticos(6, semente=1)]
+    detectados, salvos = frames[0], frames[1]
+    ultimos_frames = frames[1:]   # janela de 5 frames, igual a media do hold
+    angulos_detec, validos_detec = angulos_para_vetor(detectados)
+    angulos_salvos, validos_salvos = angulos_para_vetor(salvos)
+
+    return {
+        'comparar_angulos': cronometrar(lambda: comparar_angulos(detectados, salvos, 'braco_e_perna'), repeticoes),
+        'comparar_angulos_vetor': cronometrar(
+            lambda: comparar_angulos_vetor(angulos_detec, validos_detec, angulos_salvos, validos_salvos,
+                                           'braco_e_perna'), repeticoes),
+        'get_media_angulos_5': cronometrar(lambda: get_media_angulos(ultimos_frames), repeticoes),
+    }
+
+
+def bench_desenho(repeticoes=500, resolucao_camera=(1280, 720)):
+    frame_base = cv2.resize(imagens_referencia()[0], resolucao_camera, interpolation=cv2.INTER_LINEAR)
+    frame = frame_base.copy()
+    pontos_lm = landmarks_sinteticos(1, semente=2)[0]
+    landmarks = [lm if lm.presence >= PRESENCE_THRESHOLD else None for lm in array_para_landmarks(pontos_lm)]
+    pontos, mascara = landmarks_para_array(landmarks)
+    errados = [TRIPLETOS[0], TRIPLETOS[3]]
+
+    def desenhar(funcao, *args):
+        np.copyto(frame, frame_base)   # o desenho e in-place: parte sempre do mesmo frame
+        funcao(frame, *args)
+
+    copia = cronometrar(lambda: np.copyto(frame, frame_base), repeticoes)
+    return {
+        # tempo da copia de restauracao descontado
+        'draw_skeleton': cronometrar(lambda: desenhar(draw_skeleton, landmarks, errados), repeticoes) - copia,
+        'draw_skeleton_array': cronometrar(
+            lambda: desenhar(draw_skeleton_array, pontos, mascara, errados), repeticoes) - copia,
+        'draw_stats': cronometrar(lambda: desenhar(draw_stats, 1, 2, 3, 4.5), repeticoes) - copia,
+    }
+
+
+# Caminho de exibicao original: flip + draw_stats com copia do frame inteiro + 2 resizes + hstack
+def compor_original(frame, ref_img, largura_esquerda, largura_direita, altura):
+    frame = cv2.flip(frame, 1)
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (0, 20), (350, 170), (0, 0, 0), -1)
+    cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+    ref_img_resized = cv2.resize(ref_img, (largura_direita, altura), interpolation=cv2.INTER_LINEAR)
+    frame_redimensionado = cv2.resize(frame, (largura_esquerda, altura), interpolation=cv2.INTER_LINEAR)
+    return np.hstack((frame_redimensionado, ref_img_resized))
+
+
+def bench_composicao(repeticoes=200, largura=1920, altura=1080, resolucao_camera=(1280, 720)):
+    imagens = imagens_referencia()
+    frame = cv2.resize(imagens[0], resolucao_camera, interpolation=cv2.INTER_LINEAR)
+    largura_esquerda = int(largura * 2 / 3)
+    compositor = Compositor(largura, altura, largura_esquerda)
+    quadro = [0]
+
+    def compor_novo(trocar_referencia):
+        # trocar_referencia: simula a troca de pose a cada frame (pior caso do cache do painel)
+        if trocar_referencia:
+            quadro[0] += 1
+        indice = quadro[0] % len(imagens)
+        compositor.atualizar_referencia(quadro[0] if trocar_referencia else indice, imagens[indice])
+        compositor.compor(frame)
+        draw_stats(compositor.painel_camera, 0, 2, 0, 0.0, compositor.escala)
+
+    return {
+        'composicao_original': cronometrar(
+            lambda: compor_original(frame, imagens[0], largura_esquerda, largura - largura_esquerda, altura),
+            repeticoes),
+        'composicao_compositor': cronometrar(lambda: compor_novo(False), repeticoes),
+        'composicao_troca_referencia': cronometrar(lambda: compor_novo(True), repeticoes),
+    }
+
+
+def bench_indice(repeticoes=500, num_exercicios=1000, poses_por_exercicio=3):
+    # biblioteca sintetica com num_exercicios * poses_por_exercicio poses
+    rng = np.random.default_rng(0)
+    tipos = ['braco', 'perna', 'braco_e_perna']
+    exercicios = [ExercicioCompilado(f"exercicio_{i}",
+                                     rng.uniform(0, 180, size=(poses_por_exercicio, NUM_TRIPLETOS)).astype(np.float32),
+                                     tipos[i % 3], 10)
+                  for i in range(num_exercicios)]
+    indice = IndicePoses(exercicios)
+    angulos = rng.uniform(0, 180, size=NUM_TRIPLETOS).astype(np.float32)
+    validos = np.ones(NUM_TRIPLETOS, dtype=bool)
+    return {f'consulta_k5_{len(indice)}_poses': cronometrar(lambda: indice.consultar(angulos, validos, k=5), repeticoes)}
+
+
+# Processa um video como o monitor: decodificacao, inferencia, angulos, esqueleto e composicao, sem
+# exibicao e sem esperar o tempo real do video. Sem rastreador o landmarker roda no modo VIDEO; com
+# um RastreadorROI, no modo IMAGE sobre os recortes (como o monitor com --roi).
+# Retorna (fps, angulos (N, T), validos (N, T)), ou None se nenhum frame foi lido
+def processar_video_modelo(mp, video, tier, max_frames, compositor, rastreador=None):
+    modo = mp.tasks.vision.RunningMode.VIDEO if rastreador is None else mp.tasks.vision.RunningMode.IMAGE
+    options = mp.tasks.vision.PoseLandmarkerOptions(
+        base_options=mp.tasks.BaseOptions(model_asset_path=MODEL_PATHS[tier]),
+        running_mode=modo,
+        output_segmentation_masks=False,
+        num_poses=1
+    )
+    cap = cv2.VideoCapture(video)
+    fps_video = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    sem_pose = (np.full(NUM_TRIPLETOS, np.nan, dtype=np.float32), np.zeros(NUM_TRIPLETOS, dtype=bool))
+    angulos_video, validos_video = [], []
+    with mp.tasks.vision.PoseLandmarker.create_from_options(options) as landmarker:
+        inicio = time.perf_counter()
+        while len(angulos_video) < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if rastreador is None:
+                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                result = landmarker.detect_for_video(mp_image, int(len(angulos_video) * 1000 / fps_video))
+            else:
+                imagem_rgb, caixa = rastreador.preparar(frame)
+                result = landmarker.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=imagem_rgb))
+                rastreador.processar_resultado(result, caixa, frame.shape)
+            angulos, validos = sem_pose
+            if result.pose_landmarks:
+                pontos, mascara, angulos, validos = calcular_angulos_resultado(result)
+                draw_skeleton_array(frame, pontos, mascara, [])
+            compositor.compor(frame)
+            angulos_video.append(angulos)
+            validos_video.append(validos)
+        duracao = time.perf_counter() - inicio
+    cap.release()
+    if not angulos_video:
+        return None
+    return len(angulos_video) / duracao, np.stack(angulos_video), np.stack(validos_video)
+
+
+# Tremor: variacao media (graus) do angulo entre frames consecutivos em que ele foi detectado
+def tremor_angulos(angulos, validos):
+    consecutivos = validos[1:] & validos[:-1]
+    if not consecutivos.any():
+        return float('nan')
+    return float(np.abs(np.diff(angulos, axis=0))[consecutivos].mean())
+
+
+# FPS ponta a ponta de cada modelo sobre um video. Com roi=True mede tambem o modo --roi e compara
+# os angulos dele com os do frame inteiro (referencia), frame a frame: diferenca media e p95 nos
+# tripletos detectados pelos dois, e o tremor de cada modo (um recorte pior aparece como mais tremor).
+# Retorna (fps por modelo, diferencas em graus por modelo)
+def bench_modelos(video, tiers=TIERS, max_frames=300, largura=1920, altura=1080, roi=False):
+    import mediapipe as mp   # so necessario para este benchmark
+
+    compositor = Compositor(largura, altura, int(largura * 2 / 3))
+    resultados = {}
+    diferencas_roi = {}
+    for tier in tiers:
+        if not os.path.isfile(MODEL_PATHS[tier]):
+            print(f"Aviso: modelo '{MODEL_PATHS[tier]}' não encontrado, pulando {tier}.")
+            continue
+        medicao = processar_video_modelo(mp, video, tier, max_frames, compositor)
+        if medicao is None:
+            continue
+        resultados[f'fps_{tier}'], angulos, validos = medicao
+        if not roi:
+            continue
+        fps_roi, angulos_roi, validos_roi = processar_video_modelo(mp, video, tier, max_frames, compositor,
+                                                                   RastreadorROI())
+        resultados[f'fps_{tier}_roi'] = fps_roi
+        n = min(len(angulos), len(angulos_roi))
+        angulos, validos, angulos_roi, validos_roi = angulos[:n], validos[:n], angulos_roi[:n], validos_roi[:n]
+        ambos = validos & validos_roi
+        if ambos.any():
+            diferencas = np.abs(angulos_roi[ambos] - angulos[ambos])
+            diferencas_roi[f'diferenca_media_{tier}_roi'] = float(diferencas.mean())
+            diferencas_roi[f'diferenca_p95_{tier}_roi'] = float(np.percentile(diferencas, 95))
+        diferencas_roi[f'tremor_{tier}'] = tremor_angulos(angulos, validos)
+        diferencas_roi[f'tremor_{tier}_roi'] = tremor_angulos(angulos_roi, validos_roi)
+        perdidos = int(np.sum(validos.any(axis=1) & ~validos_roi.any(axis=1)))
+        print(f"Aviso: {tier} com ROI perdeu a pose em {perdidos} de {n} frames detectados no frame inteiro."
+              if perdidos else f"{tier} com ROI detectou a pose em todos os frames do frame inteiro.")
+    return resultados, diferencas_roi
+
+
+def metadados(args):
+    return {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'nucleos': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'threads_opencv': cv2.getNumThreads(),
+        'repeticoes': args.repeticoes,
+        'video': args.video,
+    }
+
+
+# Compara duas execucoes grupo a grupo. Em ms e graus menor e melhor, em fps maior e melhor.
+# Retorna [(grupo, nome, valor_base, valor_atual, variacao, regressao)]
+def comparar_resultados(base, atual, tolerancia=TOLERANCIA_REGRESSAO):
+    linhas = []
+    for grupo, dados in atual['grupos'].items():
+        dados_base = base['grupos'].get(grupo)
+        if dados_base is None:
+            continue
+        maior_melhor = dados['unidade'] == 'fps'
+        for nome, valor in dados['resultados'].items():
+            valor_base = dados_base['resultados'].get(nome)
+            if not valor_base:
+                continue
+            variacao = valor / valor_base - 1
+            piora = -variacao if maior_melhor else variacao
+            linhas.append((grupo, nome, valor_base, valor, variacao, piora > tolerancia))
+    return linhas
+
+
+def imprimir_resultados(titulo, resultados, unidade='ms'):
+    print(f"\n{titulo}")
+    for nome, valor in resultados.items():
+        if unidade == 'fps':
+            print(f"  {nome:<28} {valor:10.2f} fps")
+        elif unidade == 'graus':
+            print(f"  {nome:<28} {valor:10.2f} graus")
+        else:
+            print(f"  {nome:<28} {valor * 1000:10.2f} us")
+
+
+def imprimir_comparacao(linhas, tolerancia):
+    print(f"\nComparação com a execução base (tolerância {tolerancia:.0%})")
+    for grupo, nome, valor_base, valor, variacao, regressao in linhas:
+        marca = "REGRESSAO" if regressao else ""
+        print(f"  {grupo + '/' + nome:<44} {valor_base:12.5f} -> {valor:12.5f}  {variacao:+7.1%}  {marca}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks do monitor de exercicios")
+    parser.add_argument('--repeticoes', type=int, default=2000, help='Chamadas por rodada de medicao')
+    parser.add_argument('--video', help='Vídeo gravado para medir o FPS ponta a ponta de cada modelo')
+    parser.add_argument('--models', nargs='+', choices=TIERS, default=TIERS, help='Modelos medidos com --video')
+    parser.add_argument('--max_frames', type=int, default=300, help='Frames do vídeo processados por modelo')
+    parser.add_argument('--roi', action='store_true',
+                        help='Com --video, mede também o modo --roi e compara seus ângulos com os do frame inteiro')
+    parser.add_argument('--output', help='Salva os resultados neste arquivo JSON')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar (sai com código 1 se houver regressão)')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCIA_REGRESSAO,
+                        help='Piora relativa tolerada antes de marcar regressão (padrão: 0.10)')
+    parser.add_argument('--skip_3d_budget', action='store_true',
+                        help='Não verifica se o modo 3D cabe no custo por frame do 2D (mais --tolerance)')
+    args = parser.parse_args()
+
+    # (chave, titulo, unidade, funcao)
+    grupos = [
+        ('geometria', "Geometria (tempo por frame)", 'ms', lambda: bench_geometria(args.repeticoes)),
+        ('comparacao', "Comparação de ângulos (tempo por chamada)", 'ms', lambda: bench_comparacao(args.repeticoes)),
+        ('modos_angulo', "Ângulos 2D x 3D (tempo por frame)", 'ms', lambda: bench_modos_angulo(args.repeticoes)),
+        ('indice', "Indice de poses (tempo por consulta)", 'ms', lambda: bench_indice(max(1, args.repeticoes // 4))),
+        ('desenho', "Desenho 1280x720 (tempo por frame)", 'ms', lambda: bench_desenho(max(1, args.repeticoes // 4))),
+        ('composicao', "Composicao 1920x1080 (tempo por frame)", 'ms',
+         lambda: bench_composicao(max(1, args.repeticoes // 10))),
+    ]
+    if args.video:
+        if not os.path.isfile(args.video):
+            print(f"Erro: O arquivo '{args.video}' não foi encontrado.")
+            sys.exit(1)
+        # o video e processado uma vez so para os dois grupos
+        medicoes_video = {}
+
+        def medir_video(grupo):
+            if not medicoes_video:
+                medicoes_video['modelos'], medicoes_video['roi'] = bench_modelos(
+                    args.video, args.models, args.max_frames, roi=args.roi)
+            return medicoes_video[grupo]
+
+        grupos.append(('modelos', "Ponta a ponta por modelo (frames por segundo)", 'fps',
+                       lambda: medir_video('modelos')))
+        if args.roi:
+            grupos.append(('roi', "ROI x frame inteiro: diferença e tremor dos ângulos", 'graus',
+                           lambda: medir_video('roi')))
+
+    execucao = {'metadados': metadados(args), 'grupos': {}}
+    for chave, titulo, unidade, funcao in grupos:
+        resultados = funcao()
+        imprimir_resultados(titulo, resultados, unidade)
+        execucao['grupos'][chave] = {'unidade': unidade, 'resultados': resultados}
+
+    orcamento_3d = True
+    if not args.skip_3d_budget:
+        orcamento_3d = verificar_orcamento_3d(razao_3d_2d(max(1, args.repeticoes // 4)), args.tolerance)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(execucao, f, indent=2)
+        print(f"\nResultados salvos em '{args.output}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        linhas = comparar_resultados(base, execucao, args.tolerance)
+        imprimir_comparacao(linhas, args.tolerance)
+        regressoes = sum(1 for linha in linhas if linha[-1])
+        if regressoes:
+            print(f"\n{regressoes} regressão(ões) acima de {args.tolerance:.0%}")
+            sys.exit(1)
+
+    if not orcamento_3d:
+        sys.exit(1)
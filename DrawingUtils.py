@@ -1,19 +1,27 @@
-import mediapipe as mp
 import cv2
 import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from GeometryUtils import TRIPLETOS
-
-mp_drawing = mp.solutions.drawing_utils
-mp_pose = mp.solutions.pose
+from GeometryUtils import TRIPLETOS, landmarks_para_array
 
 def draw_skeleton(frame, landmarks_filtrados, tripletos_errados):
+    pontos, mascara = landmarks_para_array(landmarks_filtrados)
+    return draw_skeleton_array(frame, pontos, mascara, tripletos_errados)
+
+
+# Mesmo desenho de draw_skeleton a partir de um array (33, >=2) de coordenadas normalizadas
+# e da mascara de landmarks validos (ex.: landmarks lidos do cache de um video)
+def draw_skeleton_array(frame, pontos, mascara, tripletos_errados):
+    altura, largura = frame.shape[:2]
+    pixels = (np.nan_to_num(pontos[:, :2]) * (largura, altura)).astype(int).tolist()
     for a_idx, b_idx, c_idx in TRIPLETOS:
-        pontos = [landmarks_filtrados[a_idx], landmarks_filtrados[b_idx], landmarks_filtrados[c_idx]]
-        if None not in pontos:
-            x1, y1 = int(pontos[0].x * frame.shape[1]), int(pontos[0].y * frame.shape[0])
-            x2, y2 = int(pontos[1].x * frame.shape[1]), int(pontos[1].y * frame.shape[0])
-            x3, y3 = int(pontos[2].x * frame.shape[1]), int(pontos[2].y * frame.shape[0])
+        if mascara[a_idx] and mascara[b_idx] and mascara[c_idx]:
+            x1, y1 = pixels[a_idx]
+            x2, y2 = pixels[b_idx]
+            x3, y3 = pixels[c_idx]
 
             if (a_idx, b_idx, c_idx) in tripletos_errados:
                 cv2.line(frame, (x1, y1), (x2, y2), (0, 0, 255), 6)
@@ -25,28 +33,30 @@ def draw_skeleton(frame, landmarks_filtrados, tripletos_errados):
     return frame
     
 
-def draw_stats(frame, pose_index, num_poses, reps, timer_alongamento):
+# escala: fator aplicado ao retangulo e ao texto (ex.: ao desenhar direto no canvas ja redimensionado)
+def draw_stats(frame, pose_index, num_poses, reps, timer_alongamento, escala=1.0):
     # Define tamanho e posição do retângulo de fundo
-    x, y = 0, 20
-    largura = 350
-    altura = 150
-    # Desenha retângulo preto semi-transparente
-    overlay = frame.copy()
-    cv2.rectangle(overlay, (x, y), (x + largura, y + altura), (0, 0, 0), -1)
+    x, y = 0, int(20 * escala)
+    largura = int(350 * escala)
+    altura = int(150 * escala)
+    # Escurece so a regiao do retângulo (equivale a misturar um retângulo preto com alpha)
     alpha = 0.6
-    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+    roi = frame[y:y + altura, x:x + largura]
+    cv2.addWeighted(roi, 1 - alpha, roi, 0, 0, dst=roi)
 
+    fonte = 1 * escala
+    espessura = max(1, round(2 * escala))
     # Mostra número de poses detectadas e quantas faltam para acabar o exercicio
-    cv2.putText(frame, f"Pose {pose_index}/{num_poses}", (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    cv2.putText(frame, f"Pose {pose_index}/{num_poses}", (int(10 * escala), int(60 * escala)),
+                    cv2.FONT_HERSHEY_SIMPLEX, fonte, (0, 255, 0), espessura)
         
     # Mostra numero de repetições
-    cv2.putText(frame, f"Reps: {reps}", (10, 100),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    cv2.putText(frame, f"Reps: {reps}", (int(10 * escala), int(100 * escala)),
+                cv2.FONT_HERSHEY_SIMPLEX, fonte, (0, 255, 0), espessura)
     
     # Timer de alongamento
-    cv2.putText(frame, f"Hold Time: {timer_alongamento:.2f}s", (10, 140), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    cv2.putText(frame, f"Hold Time: {timer_alongamento:.2f}s", (int(10 * escala), int(140 * escala)), 
+                            cv2.FONT_HERSHEY_SIMPLEX, fonte, (0, 255, 0), espessura)
     
     return frame
 
@@ -56,10 +66,118 @@ def load_ref_img(exercicio_imgs_dir, exercicio_imgs_filenames, pose_index):
     ref_img_loaded = cv2.imread(ref_img_path)
     ref_img_loaded = cv2.flip(ref_img_loaded, 1)
     return ref_img_loaded
-        
 
 
+# Cache das imagens de referencia de um exercicio: decodifica, espelha e redimensiona as imagens
+# em uma thread de fundo, com limite LRU. obter() nunca bloqueia: devolve None se a imagem
+# ainda nao estiver pronta (o chamador continua mostrando a anterior). Uma imagem que falha ao
+# carregar (arquivo ausente ou corrompido) nao e tentada de novo ate a pasta do exercicio mudar.
+class CacheImagensReferencia:
+    def __init__(self, exercicio_imgs_dir, exercicio_imgs_filenames, tamanho_painel=None, tamanho_max=16):
+        self.exercicio_imgs_dir = exercicio_imgs_dir
+        self.exercicio_imgs_filenames = exercicio_imgs_filenames
+        self.tamanho_painel = tamanho_painel   # (largura, altura) final da imagem, ou None
+        self.tamanho_max = tamanho_max
+        self._imagens = OrderedDict()
+        self._pendentes = set()
+        self._falhas = set()
+        self._mtime_falhas = None   # mtime da pasta quando as falhas foram registradas
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="imagens_referencia")
+
+    def _mtime_pasta(self):
+        try:
+            return os.stat(self.exercicio_imgs_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _carregar(self, pose_index):
+        img = None
+        try:
+            img = load_ref_img(self.exercicio_imgs_dir, self.exercicio_imgs_filenames, pose_index)
+            if img is not None and self.tamanho_painel is not None:
+                img = cv2.resize(img, self.tamanho_painel, interpolation=cv2.INTER_LINEAR)
+        except cv2.error:   # imread devolve None e o flip falha
+            img = None
+        finally:
+            with self._lock:
+                self._pendentes.discard(pose_index)
+        if img is None:
+            mtime = self._mtime_pasta()
+            with self._lock:
+                if mtime != self._mtime_falhas:
+                    self._falhas.clear()
+                    self._mtime_falhas = mtime
+                self._falhas.add(pose_index)
+            return
+        with self._lock:
+            self._imagens[pose_index] = img
+            self._imagens.move_to_end(pose_index)
+            while len(self._imagens) > self.tamanho_max:
+                self._imagens.popitem(last=False)
+
+    def prefetch(self, indices):
+        # so consulta a pasta se houver falhas: um arquivo novo ou substituido libera nova tentativa
+        if self._falhas and self._mtime_pasta() != self._mtime_falhas:
+            with self._lock:
+                self._falhas.clear()
+        with self._lock:
+            novos = [i for i in indices
+                     if 0 <= i < len(self.exercicio_imgs_filenames)
+                     and i not in self._imagens and i not in self._pendentes and i not in self._falhas]
+            self._pendentes.update(novos)
+        for pose_index in novos:
+            self._executor.submit(self._carregar, pose_index)
+
+    # Pre-carrega todas as poses do exercicio (ate o limite do cache)
+    def prefetch_todas(self):
+        self.prefetch(range(min(len(self.exercicio_imgs_filenames), self.tamanho_max)))
+
+    def obter(self, pose_index):
+        with self._lock:
+            img = self._imagens.get(pose_index)
+            if img is not None:
+                self._imagens.move_to_end(pose_index)
+        # garante que a pose atual e a proxima estejam (ou fiquem) no cache
+        self.prefetch([pose_index, (pose_index + 1) % max(1, len(self.exercicio_imgs_filenames))])
+        return img
+
+    def fechar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _escrever_em(destino, resultado):
+    # o OpenCV so escreve direto no dst quando consegue usar a view; senao devolve um array novo
+    if resultado is not destino:
+        np.copyto(destino, resultado)
 
 
+# Monta a tela lado a lado (camera | referencia) em um canvas alocado uma unica vez.
+# O painel de referencia so e redimensionado quando a pose muda; a camera e redimensionada
+# e espelhada direto na sua regiao do canvas.
+class Compositor:
+    def __init__(self, largura, altura, largura_camera):
+        self.canvas = np.zeros((altura, largura, 3), dtype=np.uint8)
+        self.painel_camera = self.canvas[:, :largura_camera]
+        self.painel_referencia = self.canvas[:, largura_camera:]
+        self.escala = 1.0
+        self._chave_referencia = None
 
+    # chave identifica a imagem (ex.: pose_index); a imagem ja deve vir espelhada (load_ref_img)
+    def atualizar_referencia(self, chave, ref_img):
+        if chave == self._chave_referencia:
+            return
+        altura, largura = self.painel_referencia.shape[:2]
+        _escrever_em(self.painel_referencia,
+                     cv2.resize(ref_img, (largura, altura), dst=self.painel_referencia,
+                                interpolation=cv2.INTER_LINEAR))
+        self._chave_referencia = chave
 
+    def compor(self, frame):
+        altura, largura = self.painel_camera.shape[:2]
+        _escrever_em(self.painel_camera,
+                     cv2.resize(frame, (largura, altura), dst=self.painel_camera, interpolation=cv2.INTER_LINEAR))
+        # inverte no eixo x por causa do espelhamento da camera (in-place)
+        _escrever_em(self.painel_camera, cv2.flip(self.painel_camera, 1, dst=self.painel_camera))
+        self.escala = altura / frame.shape[0]
+        return self.canvas
@@ -0,0 +1,86 @@
+### Avaliacao dos filtros temporais em sessoes gravadas: roda a maquina de estados com cada
+### filtro sobre os mesmos landmarks e conta os "falsos resets" do hold (o hold quebra e
+### recomeca logo em seguida, tipicamente por tremor dos landmarks e nao por erro do paciente)
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from ExerciseSession import SessaoExercicio
+from ExerciseStore import carregar_exercicio
+from FilterUtils import FILTROS, criar_filtro
+from LandmarkCache import EXTENSOES_VIDEO, obter_landmarks_video, angulos_landmarks_video
+
+JANELA_FALSO_RESET = 0.5   # segundos: hold que recomeca antes disso conta como falso reset
+
+
+def avaliar_filtro(exercicio, angulos, validos, detectados, timestamps, filtro, janela=JANELA_FALSO_RESET):
+    sessao = SessaoExercicio(exercicio, filtro=criar_filtro(filtro, angulos.shape[1]))
+    resultado = {'holds': 0, 'resets': 0, 'falsos_resets': 0, 'poses_concluidas': 0}
+    ultimo_reset = None
+
+    for i, timestamp_ms in enumerate(timestamps):
+        if not detectados[i]:
+            continue
+        timestamp = timestamp_ms / 1000
+        estava_segurando = sessao.holding
+        if sessao.atualizar(angulos[i], validos[i], timestamp):
+            resultado['poses_concluidas'] += 1
+            ultimo_reset = None
+        elif estava_segurando and not sessao.holding:
+            resultado['resets'] += 1
+            ultimo_reset = timestamp
+        elif not estava_segurando and sessao.holding:
+            resultado['holds'] += 1
+            if ultimo_reset is not None and timestamp - ultimo_reset <= janela:
+                resultado['falsos_resets'] += 1
+            ultimo_reset = None
+    resultado['reps'] = sessao.reps
+    return resultado
+
+
+def avaliar_video(video_entrada, exercicio, filtros):
+    landmarks_video, timestamps, _ = obter_landmarks_video(video_entrada)
+    angulos, validos = angulos_landmarks_video(landmarks_video, exercicio.modo)
+    detectados = np.isfinite(landmarks_video[:, 0, 0])
+    return {filtro: avaliar_filtro(exercicio, angulos, validos, detectados, timestamps, filtro) for filtro in filtros}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compara os filtros temporais em sessões gravadas.")
+    entrada = parser.add_mutually_exclusive_group(required=True)
+    entrada.add_argument('--path', help='Vídeo de uma sessão.')
+    entrada.add_argument('--sessions_dir', help='Diretório com vídeos de sessões.')
+    parser.add_argument('--exercise_name', required=True, help='Nome do exercício cadastrado.')
+    parser.add_argument('--filters', nargs='+', choices=FILTROS, default=FILTROS, help='Filtros a comparar.')
+    args = parser.parse_args()
+
+    if args.sessions_dir:
+        if not os.path.isdir(args.sessions_dir):
+            print(f"Erro: O diretório '{args.sessions_dir}' não foi encontrado.")
+            sys.exit(1)
+        videos = [os.path.join(args.sessions_dir, f) for f in sorted(os.listdir(args.sessions_dir))
+                  if f.lower().endswith(EXTENSOES_VIDEO)]
+    else:
+        if not os.path.isfile(args.path):
+            print(f"Erro: O arquivo '{args.path}' não foi encontrado.")
+            sys.exit(1)
+        videos = [args.path]
+
+    exercicio = carregar_exercicio(args.exercise_name)
+    totais = {filtro: {} for filtro in args.filters}
+    for video in videos:
+        print(f"\n{video}")
+        for filtro, resultado in avaliar_video(video, exercicio, args.filters).items():
+            print(f"  {filtro:<9} holds {resultado['holds']:4d}  resets {resultado['resets']:4d}  "
+                  f"falsos resets {resultado['falsos_resets']:4d}  poses {resultado['poses_concluidas']:3d}  "
+                  f"reps {resultado['reps']:3d}")
+            for chave, valor in resultado.items():
+                totais[filtro][chave] = totais[filtro].get(chave, 0) + valor
+
+    if len(videos) > 1:
+        print("\nTotal")
+        for filtro, resultado in totais.items():
+            print(f"  {filtro:<9} falsos resets {resultado['falsos_resets']:4d}  resets {resultado['resets']:4d}  "
+                  f"poses {resultado['poses_concluidas']:3d}")
@@ -0,0 +1,182 @@
+### Barramento de eventos da sessao: a maquina de estados (ExerciseSession) publica as transicoes
+### (hold iniciado/quebrado, pose e repeticao concluidas, tripletos errados) e cada assinante roda
+### na sua propria thread, com fila propria. Publicar so enfileira: audio, avisos na tela ou log
+### nunca atrasam o loop de captura/inferencia, e um assinante lento nao atrasa os outros.
+import json
+import os
+import queue
+import threading
+import time
+
+HOLD_INICIADO = "hold_started"
+HOLD_QUEBRADO = "hold_broken"
+POSE_CONCLUIDA = "pose_completed"
+REP_CONCLUIDA = "rep_completed"
+TRIPLETOS_ERRADOS = "wrong_joints"     # o conjunto de tripletos errados mudou (ex.: para avisos por voz)
+TIPOS_EVENTO = (HOLD_INICIADO, HOLD_QUEBRADO, POSE_CONCLUIDA, REP_CONCLUIDA, TRIPLETOS_ERRADOS)
+
+
+class Evento:
+    __slots__ = ('tipo', 'timestamp', 'exercicio', 'pose_index', 'reps', 'dados')
+
+    # timestamp: o mesmo relogio da sessao (segundos); dados: campos extras de cada tipo
+    def __init__(self, tipo, timestamp, exercicio, pose_index, reps, dados=None):
+        self.tipo = tipo
+        self.timestamp = timestamp
+        self.exercicio = exercicio
+        self.pose_index = pose_index
+        self.reps = reps
+        self.dados = dados or {}
+
+    def como_dict(self):
+        return {'tipo': self.tipo, 'timestamp': self.timestamp, 'exercicio': self.exercicio,
+                'pose_index': self.pose_index, 'reps': self.reps, **self.dados}
+
+
+class Assinante:
+    # callback(evento) roda na thread do assinante. iniciar() (opcional) roda nessa mesma thread
+    # antes do primeiro evento, para inicializacoes lentas (ex.: mixer de audio) fora do loop;
+    # encerrar() (opcional) roda nela depois do ultimo evento, quando o barramento e fechado.
+    # Fila cheia descarta o evento novo: quem publica nunca bloqueia.
+    def __init__(self, callback, tipos=None, nome=None, iniciar=None, encerrar=None, tamanho_fila=64):
+        self.callback = callback
+        self.tipos = frozenset(tipos) if tipos is not None else None
+        self.nome = nome or getattr(callback, '__name__', type(callback).__name__)
+        self.descartados = 0
+        self._iniciar = iniciar
+        self._encerrar = encerrar
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._thread = threading.Thread(target=self._loop, name=f"evento_{self.nome}", daemon=True)
+        self._thread.start()
+
+    def entregar(self, evento):
+        if self.tipos is not None and evento.tipo not in self.tipos:
+            return
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            self.descartados += 1
+
+    def _loop(self):
+        if self._iniciar is not None:
+            try:
+                self._iniciar()
+            except Exception as e:
+                print(f"Assinante '{self.nome}' desativado: {e}")
+                return
+        while True:
+            evento = self._fila.get()
+            if evento is None:
+                break
+            try:
+                self.callback(evento)
+            except Exception as e:   # um assinante com erro nao derruba os outros nem o monitor
+                print(f"Erro no assinante '{self.nome}' ({evento.tipo}): {e}")
+        if self._encerrar is not None:
+            try:
+                self._encerrar()
+            except Exception as e:
+                print(f"Erro ao encerrar o assinante '{self.nome}': {e}")
+
+    def fechar(self, timeout=2.0):
+        try:
+            self._fila.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+class BarramentoEventos:
+    def __init__(self):
+        self._assinantes = []
+
+    def assinar(self, callback, tipos=None, nome=None, iniciar=None, encerrar=None, tamanho_fila=64):
+        assinante = Assinante(callback, tipos, nome, iniciar, encerrar, tamanho_fila)
+        self._assinantes.append(assinante)
+        return assinante
+
+    def publicar(self, evento):
+        for assinante in self._assinantes:
+            assinante.entregar(evento)
+
+    def fechar(self):
+        for assinante in self._assinantes:
+            assinante.fechar()
+
+
+class ReprodutorAudio:
+    # Toca um som por tipo de evento. O mixer e inicializado e os arquivos sao decodificados para
+    # PCM (pygame.mixer.Sound guarda as amostras ja decodificadas) na thread do assinante, entao
+    # nem o import do pygame nem a decodificacao do MP3 passam pelo inicio do monitor.
+    def __init__(self, sons):
+        self.caminhos = dict(sons)     # {tipo_evento: arquivo}
+        self.sons = {}
+        self.pronto = threading.Event()
+
+    def iniciar(self):
+        os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+        import pygame
+        pygame.mixer.init()
+        self.sons = {tipo: pygame.mixer.Sound(caminho) for tipo, caminho in self.caminhos.items()}
+        self.pronto.set()
+
+    def __call__(self, evento):
+        som = self.sons.get(evento.tipo)
+        if som is not None:
+            som.play()
+
+    def assinar(self, barramento):
+        return barramento.assinar(self, tipos=self.caminhos.keys(), nome="audio", iniciar=self.iniciar)
+
+
+class AvisosTela:
+    # Guarda a mensagem curta do ultimo evento (ex.: "Pose concluida!") para a thread de exibicao
+    # desenhar; a thread do assinante so troca a tupla, a exibicao so le.
+    MENSAGENS = {
+        HOLD_INICIADO: ("Segure a pose", (0, 255, 255)),
+        HOLD_QUEBRADO: ("Pose perdida", (0, 0, 255)),
+        POSE_CONCLUIDA: ("Pose concluida!", (0, 255, 0)),
+        REP_CONCLUIDA: ("Repeticao concluida!", (0, 255, 0)),
+    }
+
+    def __init__(self, duracao=1.5):
+        self.duracao = duracao
+        self._atual = None    # (texto, cor, expira_em)
+
+    def __call__(self, evento):
+        texto, cor = self.MENSAGENS[evento.tipo]
+        self._atual = (texto, cor, time.monotonic() + self.duracao)
+
+    def mensagem(self):
+        atual = self._atual
+        if atual is None or time.monotonic() > atual[2]:
+            return None
+        return atual[0], atual[1]
+
+    def assinar(self, barramento):
+        return barramento.assinar(self, tipos=self.MENSAGENS.keys(), nome="avisos_tela")
+
+
+class RegistroEventos:
+    # Acrescenta cada evento como uma linha JSON no arquivo
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def iniciar(self):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        self._arquivo = open(self.caminho, 'a')
+
+    def __call__(self, evento):
+        self._arquivo.write(json.dumps(evento.como_dict()) + '\n')
+        self._arquivo.flush()
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    # o arquivo e fechado na thread do assinante quando o barramento e fechado
+    def assinar(self, barramento):
+        return barramento.assinar(self, nome="registro_eventos", iniciar=self.iniciar, encerrar=self.fechar,
+                                  tamanho_fila=1024)
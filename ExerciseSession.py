@@ -0,0 +1,124 @@
+### Maquina de estados de uma sessao de exercicio (comparacao com a pose de referencia, timer de
+### alongamento, avanco de pose e contagem de repeticoes), dirigida pelo timestamp de cada frame
+### para funcionar igual na webcam e em videos gravados
+import numpy as np
+
+from Events import Evento, HOLD_INICIADO, HOLD_QUEBRADO, POSE_CONCLUIDA, REP_CONCLUIDA, TRIPLETOS_ERRADOS
+from GeometryUtils import comparar_angulos_vetor, media_angulos_vetor
+from PoseIndex import IndicePoses
+
+FRAMES_MEDIA = 5   # sem filtro, durante o holding compara a media de FRAMES_MEDIA frames
+
+
+class SessaoExercicio:
+    # filtro: filtro temporal do FilterUtils aplicado aos angulos em todo frame (a comparacao
+    # tambem passa a ser feita em todo frame). Sem filtro usa a media de FRAMES_MEDIA frames.
+    # ordem_livre: as poses podem ser feitas em qualquer ordem; fora do hold a pose comparada e a
+    # mais proxima entre as que ainda faltam na repeticao (via PoseIndex.IndicePoses).
+    # barramento: Events.BarramentoEventos opcional que recebe as transicoes da sessao.
+    def __init__(self, exercicio, debug=False, filtro=None, ordem_livre=False, barramento=None):
+        self.exercicio = exercicio
+        self.barramento = barramento
+        self.debug = debug
+        self.filtro = filtro
+        self.indice_livre = None
+        self.poses_feitas = np.zeros(exercicio.num_poses, dtype=bool)
+        if ordem_livre:
+            self.indice_livre = IndicePoses([exercicio])
+        self.pose_index = 0           # Index da pose atual sendo usada na comparacao
+        self.reps = 0                 # Contador de repetições
+        self.holding = False
+        self.inicio_alongamento = None
+        self.timer_alongamento = 0.0
+        self.pose_correta = False
+        self.tripletos_errados = []
+        self.rmse = None
+        self.conjunto_frames = []
+
+    # Troca os dados de referencia do exercicio (ex.: YAML editado durante a sessao) mantendo as
+    # repeticoes; um hold em andamento recomeca, porque foi medido contra a referencia antiga
+    def trocar_exercicio(self, exercicio):
+        self.exercicio = exercicio
+        if self.indice_livre is not None:
+            self.indice_livre = IndicePoses([exercicio])
+        if len(self.poses_feitas) != exercicio.num_poses:
+            self.poses_feitas = np.zeros(exercicio.num_poses, dtype=bool)
+        if self.pose_index >= exercicio.num_poses:
+            self.pose_index = 0
+        self._resetar_alongamento()
+        self.tripletos_errados = []
+        self.rmse = None
+
+    def _publicar(self, tipo, timestamp, **dados):
+        if self.barramento is not None:
+            self.barramento.publicar(Evento(tipo, timestamp, self.exercicio.nome, self.pose_index, self.reps, dados))
+
+    def _resetar_alongamento(self):
+        self.inicio_alongamento = None
+        self.timer_alongamento = 0.0
+        self.holding = False
+        self.conjunto_frames = []
+
+    def _comparar(self, angulos, validos):
+        if self.indice_livre is not None and not self.holding:
+            vizinhos = self.indice_livre.consultar(angulos, validos, k=1, permitidos=~self.poses_feitas)
+            if vizinhos:
+                self.pose_index = vizinhos[0][1]
+        angulos_ref, validos_ref = self.exercicio.pose(self.pose_index)
+        self.pose_correta, self.tripletos_errados, self.rmse = comparar_angulos_vetor(
+            angulos, validos, angulos_ref, validos_ref, self.exercicio.tipo_exercicio, self.debug
+        )
+
+    # Processa os angulos de um frame com pose detectada; timestamp em segundos.
+    # Retorna True quando a pose atual foi concluida neste frame.
+    def atualizar(self, angulos, validos, timestamp):
+        tripletos_anteriores = self.tripletos_errados
+        if self.filtro is not None:
+            self._comparar(*self.filtro.filtrar(angulos, validos, timestamp))
+        else:
+            if self.holding:
+                self.conjunto_frames.append((angulos, validos))
+
+            if not self.holding or len(self.conjunto_frames) == FRAMES_MEDIA:
+                if self.conjunto_frames:
+                    angulos, validos = media_angulos_vetor(
+                        np.stack([a for a, _ in self.conjunto_frames]), np.stack([v for _, v in self.conjunto_frames])
+                    )
+                    self.conjunto_frames = []
+                self._comparar(angulos, validos)
+
+        if self.tripletos_errados != tripletos_anteriores:
+            self._publicar(TRIPLETOS_ERRADOS, timestamp, tripletos=self.tripletos_errados)
+
+        if not self.pose_correta:
+            if self.holding:
+                self._publicar(HOLD_QUEBRADO, timestamp, duracao=self.timer_alongamento)
+            self._resetar_alongamento()
+            return False
+
+        if self.inicio_alongamento is None:
+            self.inicio_alongamento = timestamp
+            self.holding = True
+            self._publicar(HOLD_INICIADO, timestamp)
+            return False
+
+        self.timer_alongamento = timestamp - self.inicio_alongamento
+        if self.timer_alongamento < self.exercicio.tempo_alongamento:
+            return False
+
+        self._resetar_alongamento()
+        self._publicar(POSE_CONCLUIDA, timestamp)
+        if self.indice_livre is not None:
+            self.poses_feitas[self.pose_index] = True
+            if self.poses_feitas.all():
+                self.poses_feitas[:] = False
+                self.reps += 1
+                self._publicar(REP_CONCLUIDA, timestamp)
+            return True
+
+        self.pose_index += 1
+        if self.pose_index >= self.exercicio.num_poses:
+            self.pose_index = 0
+            self.reps += 1
+            self._publicar(REP_CONCLUIDA, timestamp)
+        return True
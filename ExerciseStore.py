@@ -0,0 +1,138 @@
+### Armazenamento compilado dos exercicios cadastrados: cada YAML de exercises_output vira um
+### .npy (poses x tripletos, NaN = angulo ausente) + um .json com os metadados. O .npy e lido
+### direto (sem o parse do YAML) e so e recompilado quando o mtime do YAML muda. Exercicios
+### cadastrados com os angulos 3D (secao frames_3d do YAML) ganham um segundo .npy (<nome>.3d.npy).
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from GeometryUtils import CHAVES_TRIPLETOS, INDICE_CHAVE, MODOS_ANGULO
+
+DIR_EXERCICIOS = "exercises_output"
+DIR_COMPILADOS = "exercises_compiled"
+SECOES_MODO = {'2d': 'frames', '3d': 'frames_3d'}   # secao do YAML com os angulos de cada modo
+
+
+class ExercicioCompilado:
+    def __init__(self, nome, angulos, tipo_exercicio, tempo_alongamento, modo='2d'):
+        self.nome = nome
+        self.modo = modo                       # '2d' ou '3d': de onde os angulos de referencia vieram
+        self.angulos = angulos                 # (P, T) float32, indexado por pose_index
+        self.validos = ~np.isnan(angulos)      # (P, T) bool
+        self.tipo_exercicio = tipo_exercicio
+        self.tempo_alongamento = tempo_alongamento
+
+    @property
+    def num_poses(self):
+        return self.angulos.shape[0]
+
+    def pose(self, pose_index):
+        return self.angulos[pose_index], self.validos[pose_index]
+
+
+def listar_exercicios(dir_exercicios=DIR_EXERCICIOS):
+    return sorted(f[:-len('.yaml')] for f in os.listdir(dir_exercicios) if f.endswith('.yaml'))
+
+
+def _caminhos(nome, dir_exercicios, dir_compilados):
+    return (os.path.join(dir_exercicios, f"{nome}.yaml"),
+            os.path.join(dir_compilados, f"{nome}.npy"),
+            os.path.join(dir_compilados, f"{nome}.json"))
+
+
+def _caminho_npy_modo(caminho_npy, modo):
+    return caminho_npy if modo == '2d' else f"{caminho_npy[:-len('.npy')]}.{modo}.npy"
+
+
+def _precisa_compilar(caminho_yaml, caminho_npy, caminho_meta):
+    if not os.path.isfile(caminho_npy) or not os.path.isfile(caminho_meta):
+        return True
+    with open(caminho_meta, "r") as f:
+        meta = json.load(f)
+    return (meta.get('mtime_yaml') != os.stat(caminho_yaml).st_mtime_ns or
+            meta.get('tripletos') != CHAVES_TRIPLETOS)
+
+
+# Converte os frames do YAML ({"frame_i": {"a-b-c": angulo}}) em uma matriz (P, T)
+def angulos_yaml_para_matriz(frames):
+    indices = {int(chave.split('_')[-1]): angulos for chave, angulos in (frames or {}).items()}
+    num_poses = max(indices) + 1 if indices else 0
+    matriz = np.full((num_poses, len(CHAVES_TRIPLETOS)), np.nan, dtype=np.float32)
+    for pose_index, angulos in indices.items():
+        for chave, angulo in (angulos or {}).items():
+            if chave in INDICE_CHAVE and angulo is not None:
+                matriz[pose_index, INDICE_CHAVE[chave]] = angulo
+    return matriz
+
+
+def compilar_exercicio(nome, dir_exercicios=DIR_EXERCICIOS, dir_compilados=DIR_COMPILADOS, forcar=False):
+    caminho_yaml, caminho_npy, caminho_meta = _caminhos(nome, dir_exercicios, dir_compilados)
+    if not forcar and not _precisa_compilar(caminho_yaml, caminho_npy, caminho_meta):
+        return False
+
+    import yaml   # so necessario para (re)compilar; exercicios ja compilados abrem sem ele
+    mtime = os.stat(caminho_yaml).st_mtime_ns
+    with open(caminho_yaml, "r") as f:
+        dados = yaml.safe_load(f) or {}
+
+    os.makedirs(dir_compilados, exist_ok=True)
+    modos = [modo for modo in MODOS_ANGULO if modo == '2d' or dados.get(SECOES_MODO[modo])]
+    meta = {
+        'tipo_exercicio': dados.get('tipo_exercicio'),
+        'tempo_alongamento': dados.get('tempo_alongamento'),
+        'tripletos': CHAVES_TRIPLETOS,
+        'modos': modos,
+        'mtime_yaml': mtime,
+    }
+    # escreve em arquivos temporarios e troca atomicamente, para nunca deixar um par npy/json pela
+    # metade; o json vai por ultimo, entao um .npy de um modo so e lido depois de estar completo.
+    # O sufixo e unico por processo/thread: o monitor e o vigia da biblioteca podem compilar o
+    # mesmo exercicio ao mesmo tempo.
+    sufixo = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    for modo in modos:
+        caminho_modo = _caminho_npy_modo(caminho_npy, modo)
+        with open(caminho_modo + sufixo, 'wb') as f:
+            np.save(f, angulos_yaml_para_matriz(dados.get(SECOES_MODO[modo])))
+        os.replace(caminho_modo + sufixo, caminho_modo)
+    with open(caminho_meta + sufixo, 'w') as f:
+        json.dump(meta, f)
+    os.replace(caminho_meta + sufixo, caminho_meta)
+    return True
+
+
+def modos_exercicio(nome, dir_exercicios=DIR_EXERCICIOS, dir_compilados=DIR_COMPILADOS):
+    compilar_exercicio(nome, dir_exercicios, dir_compilados)
+    with open(_caminhos(nome, dir_exercicios, dir_compilados)[2], "r") as f:
+        return json.load(f).get('modos', ['2d'])
+
+
+def carregar_exercicio(nome, dir_exercicios=DIR_EXERCICIOS, dir_compilados=DIR_COMPILADOS, modo='2d'):
+    compilar_exercicio(nome, dir_exercicios, dir_compilados)
+    _, caminho_npy, caminho_meta = _caminhos(nome, dir_exercicios, dir_compilados)
+    with open(caminho_meta, "r") as f:
+        meta = json.load(f)
+    if modo not in meta.get('modos', ['2d']):
+        raise ValueError(f"O exercício '{nome}' não tem ângulos {modo.upper()} cadastrados "
+                         f"(recadastre o vídeo com o ProcessVideo para gerá-los).")
+    # sem memory-map: a matriz tem poucos KB e o arquivo fica fechado depois da leitura. Com o .npy
+    # mapeado, o os.replace da recompilacao (vigia da biblioteca) falharia no Windows com
+    # PermissionError enquanto o exercicio estivesse aberto.
+    angulos = np.load(_caminho_npy_modo(caminho_npy, modo))
+    return ExercicioCompilado(nome, angulos, meta['tipo_exercicio'], meta['tempo_alongamento'], modo)
+
+
+def compilar_biblioteca(dir_exercicios=DIR_EXERCICIOS, dir_compilados=DIR_COMPILADOS, forcar=False):
+    return [nome for nome in listar_exercicios(dir_exercicios)
+            if compilar_exercicio(nome, dir_exercicios, dir_compilados, forcar)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compila os exercicios cadastrados para o formato binario.")
+    parser.add_argument('--forcar', action='store_true', help='Recompila mesmo os exercicios sem alteracao')
+    args = parser.parse_args()
+
+    compilados = compilar_biblioteca(forcar=args.forcar)
+    print(f"{len(compilados)} exercício(s) compilado(s): {', '.join(compilados) or '-'}")
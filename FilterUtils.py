@@ -0,0 +1,160 @@
+### Filtros temporais em streaming para o vetor de angulos (um valor por tripleto). O estado
+### de cada filtro e um array pre-alocado de tamanho fixo, atualizado a cada frame.
+import math
+
+import numpy as np
+
+FILTROS = ['one_euro', 'ema', 'median', 'none']
+
+
+class FiltroOneEuro:
+    # One-Euro filter (Casiez et al.): passa-baixa cuja frequencia de corte sobe com a velocidade,
+    # suavizando o tremor com o corpo parado sem atrasar movimentos rapidos.
+    # min_cutoff em Hz; beta em Hz por grau/s.
+    def __init__(self, num_valores, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._x = np.zeros(num_valores, dtype=np.float64)
+        self._dx = np.zeros(num_valores, dtype=np.float64)
+        self._iniciado = np.zeros(num_valores, dtype=bool)
+        self._saida = np.zeros(num_valores, dtype=np.float32)
+        self._t = None
+        # buffers de trabalho: filtrar() nao aloca arrays novos a cada frame
+        self._dx_atual = np.zeros(num_valores, dtype=np.float64)
+        self._alpha_x = np.zeros(num_valores, dtype=np.float64)
+        self._aux = np.zeros(num_valores, dtype=np.float64)
+        self._atualizar = np.zeros(num_valores, dtype=bool)
+        self._mascara = np.zeros(num_valores, dtype=bool)
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def resetar(self):
+        self._iniciado[:] = False
+        self._t = None
+
+    def filtrar(self, valores, validos, timestamp):
+        atualizar = np.logical_and(validos, self._iniciado, out=self._atualizar)
+        if self._t is not None and atualizar.any():
+            dt = max(timestamp - self._t, 1e-3)
+            # dx = alpha_d * (valores - x) / dt + (1 - alpha_d) * dx_anterior
+            alpha_d = self._alpha(self.d_cutoff, dt)
+            dx = np.subtract(valores, self._x, out=self._dx_atual)
+            dx *= alpha_d / dt
+            np.multiply(self._dx, 1 - alpha_d, out=self._aux)
+            dx += self._aux
+            # _alpha com o corte min_cutoff + beta * |dx|: 1 / (1 + tau / dt) = c / (c + 1), c = 2 pi corte dt
+            alpha = np.abs(dx, out=self._alpha_x)
+            alpha *= self.beta
+            alpha += self.min_cutoff
+            alpha *= 2 * math.pi * dt
+            np.add(alpha, 1.0, out=self._aux)
+            alpha /= self._aux
+            # x = alpha * valores + (1 - alpha) * x = x + alpha * (valores - x)
+            np.subtract(valores, self._x, out=self._aux)
+            self._aux *= alpha
+            self._aux += self._x
+            np.copyto(self._x, self._aux, where=atualizar)
+            np.copyto(self._dx, dx, where=atualizar)
+
+        # valores que (re)aparecem comecam do valor medido; os ausentes reiniciam ao voltar
+        novos = np.logical_not(self._iniciado, out=self._mascara)
+        novos &= validos
+        np.copyto(self._x, valores, where=novos)
+        np.copyto(self._dx, 0.0, where=novos)
+        np.copyto(self._iniciado, validos)
+        self._t = timestamp
+
+        np.copyto(self._saida, self._x, casting='same_kind')
+        np.copyto(self._saida, np.nan, where=np.logical_not(validos, out=self._mascara))
+        return self._saida, validos
+
+
+class FiltroExponencial:
+    # Media movel exponencial simples; alpha = peso do valor novo
+    def __init__(self, num_valores, alpha=0.4):
+        self.alpha = alpha
+        self._x = np.zeros(num_valores, dtype=np.float64)
+        self._iniciado = np.zeros(num_valores, dtype=bool)
+        self._saida = np.zeros(num_valores, dtype=np.float32)
+        # buffers de trabalho: filtrar() nao aloca arrays novos a cada frame
+        self._aux = np.zeros(num_valores, dtype=np.float64)
+        self._mascara = np.zeros(num_valores, dtype=bool)
+
+    def resetar(self):
+        self._iniciado[:] = False
+
+    def filtrar(self, valores, validos, timestamp):
+        # x = alpha * valores + (1 - alpha) * x = x + alpha * (valores - x)
+        np.subtract(valores, self._x, out=self._aux)
+        self._aux *= self.alpha
+        self._aux += self._x
+        np.copyto(self._x, self._aux, where=np.logical_and(validos, self._iniciado, out=self._mascara))
+        np.copyto(self._x, valores, where=np.logical_and(validos, np.logical_not(self._iniciado, out=self._mascara),
+                                                         out=self._mascara))
+        np.copyto(self._iniciado, validos)
+        np.copyto(self._saida, self._x, casting='same_kind')
+        np.copyto(self._saida, np.nan, where=np.logical_not(validos, out=self._mascara))
+        return self._saida, validos
+
+
+class FiltroMediana:
+    # Mediana dos ultimos `janela` frames em um buffer circular (ignora os valores ausentes).
+    # A mediana sai de uma copia ordenada do buffer (os NaN vao para o fim de cada coluna), lendo
+    # as posicoes do meio de cada coluna com take(out=...): filtrar() nao aloca arrays novos.
+    def __init__(self, num_valores, janela=5):
+        self._buffer = np.full((janela, num_valores), np.nan, dtype=np.float32)
+        self._presentes = np.zeros((janela, num_valores), dtype=bool)
+        self._posicao = 0
+        self._saida = np.full(num_valores, np.nan, dtype=np.float32)
+        self._ordenado = np.empty_like(self._buffer)
+        self._contagem = np.zeros(num_valores, dtype=np.intp)
+        self._linhas = np.zeros(num_valores, dtype=np.intp)
+        self._indices = np.zeros(num_valores, dtype=np.intp)
+        self._colunas = np.arange(num_valores, dtype=np.intp)
+        self._aux = np.zeros(num_valores, dtype=np.float32)
+        self._mascara = np.zeros(num_valores, dtype=bool)
+
+    def resetar(self):
+        self._buffer[:] = np.nan
+        self._presentes[:] = False
+
+    def _ler_posicoes(self, linhas, out):
+        # out[j] = ordenado[linhas[j], j], pelo indice plano de cada elemento
+        np.multiply(linhas, self._buffer.shape[1], out=self._indices)
+        self._indices += self._colunas
+        self._ordenado.take(self._indices, out=out)
+
+    def filtrar(self, valores, validos, timestamp):
+        ausentes = np.logical_not(validos, out=self._mascara)
+        linha = self._buffer[self._posicao]
+        np.copyto(linha, valores, casting='same_kind')
+        np.copyto(linha, np.nan, where=ausentes)
+        np.copyto(self._presentes[self._posicao], validos)
+        self._posicao = (self._posicao + 1) % len(self._buffer)
+
+        # com k valores presentes na coluna, a mediana e a media das posicoes (k - 1) // 2 e k // 2
+        np.copyto(self._ordenado, self._buffer)
+        self._ordenado.sort(axis=0)
+        np.sum(self._presentes, axis=0, out=self._contagem)
+        np.maximum(self._contagem, 1, out=self._contagem)   # colunas sem valor viram NaN abaixo
+        self._ler_posicoes(np.floor_divide(self._contagem, 2, out=self._linhas), self._saida)
+        self._contagem -= 1
+        self._ler_posicoes(np.floor_divide(self._contagem, 2, out=self._linhas), self._aux)
+        self._saida += self._aux
+        self._saida *= 0.5
+        np.copyto(self._saida, np.nan, where=ausentes)
+        return self._saida, validos
+
+
+def criar_filtro(nome, num_valores):
+    if nome == 'one_euro':
+        return FiltroOneEuro(num_valores)
+    if nome == 'ema':
+        return FiltroExponencial(num_valores)
+    if nome == 'median':
+        return FiltroMediana(num_valores)
+    return None
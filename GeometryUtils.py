@@ -1,8 +1,14 @@
 ### Calculos relacionados ao angulo entre vetores, calculo de erro quadratico, etc
 import math
+from itertools import chain
+from operator import attrgetter
+
 import numpy as np
 
 POSE_ERROR_THRESHOLD = 15  # RMSE mínimo para detectar uma pose como correta 
+PRESENCE_THRESHOLD = 0.5   # Limite de presença para considerar um landmark válido
+NUM_LANDMARKS = 33
+MODOS_ANGULO = ('2d', '3d')  # 2d: x/y normalizados da imagem; 3d: pose_world_landmarks (metros)
 
 TRIPLETOS = [
     (11, 13, 15),    # OMBRO E BRACO ESQUERDO
@@ -13,86 +19,241 @@ TRIPLETOS = [
     (24, 26, 28),    # PERNA DIREITA        
 ]
 
-def calcular_angulo_2d(a, b, c):    # calcula o angulo de um tripleto (angulo entre AB e CB)
-    # calcula vetores ab e cb
-    ab = (a.x - b.x, a.y - b.y)
-    cb = (c.x - b.x, c.y - b.y)
-    # calcula produto escalar: u . v = x1 * x2 + y1 * y2
-    produto_escalar = ab[0]*cb[0] + ab[1]*cb[1]
-    # norma (magnitude) dos vetores
-    norma_ab = math.hypot(*ab)
-    norma_cb = math.hypot(*cb)
-    if norma_ab == 0 or norma_cb == 0:
-        return None
-    # cos(x) = (u . v) / (|u| * |v|)      
-    cos_angulo = produto_escalar / (norma_ab * norma_cb)
-    cos_angulo = max(-1.0, min(1.0, cos_angulo)) # evita erros de arredondamento onde o cos pode ser maior que 1 ou menor que -1
-    angulo_rad = math.acos(cos_angulo)
-    return math.degrees(angulo_rad)
+# Articulacoes extras (configuraveis): ocupam posicoes proprias no vetor de angulos, depois dos
+# tripletos acima, mas so sao calculadas nos modos de MODOS_EXTRAS. Desligadas por padrao: com elas
+# o 3d calcula 10 tripletos em vez de 6 e passa do orcamento por frame do 2d (~1.3x, ver
+# Benchmark.py). No 2D o tornozelo depende dos landmarks do pe (31/32), pouco confiaveis, e mudaria
+# o significado do RMSE dos exercicios cadastrados; o esqueleto desenhado continua so com TRIPLETOS.
+TRIPLETOS_EXTRAS = [
+    (13, 11, 23),    # OMBRO ESQUERDO (abertura do braco)
+    (14, 12, 24),    # OMBRO DIREITO
+    (25, 27, 31),    # TORNOZELO ESQUERDO
+    (26, 28, 32),    # TORNOZELO DIREITO
+]
+MODOS_EXTRAS = ()   # ex.: ('3d',) para calcular (e cadastrar) os extras no 3D, ao custo acima
 
-def calcular_angulos_frame(landmarks, debug=False):  # calcula o angulo de todos tripletos em um frame
-    angulos = {}
-    for a_idx, b_idx, c_idx in TRIPLETOS:
-        # Verifica se algum dos landmarks é None (presença baixa)
-        if (landmarks[a_idx] is None or
-            landmarks[b_idx] is None or
-            landmarks[c_idx] is None):
-            if debug:
-                print(f'\nNao conseguiu detectar a posicao do tripleto ({a_idx}-{b_idx}-{c_idx})')
-            continue
-
-        p_a = landmarks[a_idx]
-        p_b = landmarks[b_idx]
-        p_c = landmarks[c_idx]
-        angulo = calcular_angulo_2d(p_a, p_b, p_c)
-        angulos[f"{a_idx}-{b_idx}-{c_idx}"] = angulo
-    return angulos
+# Todas as posicoes do vetor de angulos (T = NUM_TRIPLETOS); as dos extras ficam NaN fora de MODOS_EXTRAS
+TRIPLETOS_ANGULOS = TRIPLETOS + TRIPLETOS_EXTRAS
+NUM_TRIPLETOS = len(TRIPLETOS_ANGULOS)
 
-def get_media_angulos(arr_frames):
-    media_angulos = {}
-    contagem =  {}
-
-    for frame in arr_frames:
-        for chave, angulo in frame.items():
-            if chave in media_angulos:
-                media_angulos[chave] += angulo
-                contagem[chave] += 1
-            else:
-                media_angulos[chave] = angulo
-                contagem[chave] = 1
-    
-    for chave in media_angulos:
-        media_angulos[chave] = media_angulos[chave] / contagem[chave]
-
-    return media_angulos 
+# Versoes pre-computadas dos tripletos, para nao montar/parsear chaves "a-b-c" a cada frame
+TRIPLETOS_ARRAY = np.array(TRIPLETOS_ANGULOS, dtype=np.intp)       # (T, 3)
+CHAVES_TRIPLETOS = [f"{a}-{b}-{c}" for a, b, c in TRIPLETOS_ANGULOS]
+INDICE_CHAVE = {chave: i for i, chave in enumerate(CHAVES_TRIPLETOS)}
 
-# Compara os angulos de todos tripletos no frame, retorna o booleano indicando se 
-# a pose esta correta e uma lista com os tripletos que estao errados
-def comparar_angulos(angulos_detec, angulos_salvos, tipo_exercicio, debug=False):
-    valores_comparados = []
-    tripletos_errados = []
-    for chave, angulo_salvo in angulos_salvos.items():
-        if chave in angulos_detec:
-            # calcula erro quadratico entre os angulos
-            erro_quadratico = (angulos_detec[chave] - angulo_salvo) ** 2
-            valores_comparados.append(erro_quadratico)
-            if erro_quadratico > (POSE_ERROR_THRESHOLD ** 2):
-                tripletos_errados.append(tuple(map(int, chave.split('-'))))                
-
-        # se nao detectou o angulo de um tripleto necessario para o tipo de exercicio, retorna falso
-        elif (tipo_exercicio == 'braco' or tipo_exercicio == 'braco_e_perna') and chave in ['11-13-15', '12-14-16']:
-            if debug:
-                print("Nao detectou braco")
-            return False, []
-        elif (tipo_exercicio == 'perna' or tipo_exercicio == 'braco_e_perna') and chave in ['23-25-27', '24-26-28']:
-            if debug:
-                print("Nao detectou pernas")
-            return False, []
-
-    if not valores_comparados: # se nao detectou nada retorna falso
-        return False
+# Tripletos calculados em cada modo (prefixo de TRIPLETOS_ANGULOS)
+TRIPLETOS_MODO = {modo: TRIPLETOS_ANGULOS if modo in MODOS_EXTRAS else TRIPLETOS for modo in MODOS_ANGULO}
+
+# Tripletos que precisam ser detectados para cada tipo de exercicio
+_BRACOS = np.isin(np.arange(NUM_TRIPLETOS), [INDICE_CHAVE['11-13-15'], INDICE_CHAVE['12-14-16']])
+_PERNAS = np.isin(np.arange(NUM_TRIPLETOS), [INDICE_CHAVE['23-25-27'], INDICE_CHAVE['24-26-28']])
+TRIPLETOS_OBRIGATORIOS = {
+    'braco': _BRACOS,
+    'perna': _PERNAS,
+    'braco_e_perna': _BRACOS | _PERNAS,
+}
+
+### Motor de angulos: o angulo de um tripleto (a, b, c) e o angulo entre os vetores AB e CB.
+### Um frame do landmarker (monitor, servidor, adaptador em dicionario) vai pelo caminho escalar,
+### lendo x/y/z direto dos objetos: com 6-10 tripletos, as ~20 chamadas numpy sobre arrays
+### minusculos custam mais que a conta em Python puro. Arrays (33, 4) = [x, y, z, presence] +
+### mascara de presenca, e lotes (N, 33, 4) offline, vao pelo caminho numpy, todos os tripletos de uma vez.
+
+_ATRIBUTOS_LANDMARK = attrgetter('x', 'y', 'z', 'presence')
+_NAN = float('nan')
+_GRAUS = 180.0 / math.pi
+_TRIPLETOS_DIMS = {2: TRIPLETOS_MODO['2d'], 3: TRIPLETOS_MODO['3d']}   # dims 2 = modo 2d, 3 = modo 3d
+
+def _angulos_escalar(landmarks, presentes, dims=2):
+    # landmarks: objetos com x/y(/z) (pose_landmarks ou pose_world_landmarks); presentes: bool por
+    # landmark -> (angulos (T,) float32 com NaN nos invalidos, validos (T,) bool), igual a calcular_angulos_vetor
+    # (clamp com if e graus por multiplicacao: cada chamada evitada pesa com so 6-10 tripletos)
+    tripletos = _TRIPLETOS_DIMS[dims]
+    angulos = []
+    for a, b, c in tripletos:
+        if presentes[a] and presentes[b] and presentes[c]:
+            pa, pb, pc = landmarks[a], landmarks[b], landmarks[c]
+            bx = pb.x
+            by = pb.y
+            abx = pa.x - bx
+            aby = pa.y - by
+            cbx = pc.x - bx
+            cby = pc.y - by
+            produto_escalar = abx * cbx + aby * cby
+            quadrado_ab = abx * abx + aby * aby
+            quadrado_cb = cbx * cbx + cby * cby
+            if dims == 3:
+                bz = pb.z
+                abz = pa.z - bz
+                cbz = pc.z - bz
+                produto_escalar += abz * cbz
+                quadrado_ab += abz * abz
+                quadrado_cb += cbz * cbz
+            normas = math.sqrt(quadrado_ab * quadrado_cb)
+            if normas > 0:    # tambem descarta coordenadas NaN
+                cos_angulo = produto_escalar / normas
+                if cos_angulo > 1.0:
+                    cos_angulo = 1.0
+                elif cos_angulo < -1.0:
+                    cos_angulo = -1.0
+                angulos.append(math.acos(cos_angulo) * _GRAUS)
+                continue
+        angulos.append(_NAN)
+    angulos += [_NAN] * (NUM_TRIPLETOS - len(tripletos))    # extras nao calculados neste modo
+    angulos = np.array(angulos, dtype=np.float32)
+    return angulos, angulos == angulos     # NaN != NaN
+
+def _tuplas_landmarks(landmarks, presence_threshold=None):
+    # lista completa do landmarker -> ([(x, y, z, presence)], [presente]); os atributos sao lidos
+    # em C pelo attrgetter. Levanta AttributeError/TypeError com landmarks None ou sem presence.
+    tuplas = list(map(_ATRIBUTOS_LANDMARK, landmarks))
+    if presence_threshold is None:
+        return tuplas, [True] * len(tuplas)
+    return tuplas, [t[3] >= presence_threshold for t in tuplas]
+
+def _tuplas_para_array(tuplas, presentes):
+    pontos = np.fromiter(chain.from_iterable(tuplas), dtype=np.float32, count=4 * len(tuplas)).reshape(-1, 4)
+    return pontos, np.array(presentes, dtype=bool)
+
+def landmarks_para_array(landmarks, presence_threshold=None):
+    # landmarks: lista de 33 landmarks (ou None para os filtrados)
+    # presence_threshold=None considera valido todo landmark que nao seja None
+    try:
+        return _tuplas_para_array(*_tuplas_landmarks(landmarks, presence_threshold))
+    except (AttributeError, TypeError):
+        # landmarks filtrados (None) ou sem o campo presence (ou com presence None)
+        pontos = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        mascara = np.zeros(NUM_LANDMARKS, dtype=bool)
+        for i, lm in enumerate(landmarks):
+            if lm is None:
+                continue
+            pontos[i] = (lm.x, lm.y, lm.z, getattr(lm, 'presence', 1.0) or 0.0)
+            mascara[i] = True
+    if presence_threshold is not None:
+        mascara &= pontos[:, 3] >= presence_threshold
+    return pontos, mascara
+
+def calcular_angulos_resultado(result, modo='2d', presence_threshold=PRESENCE_THRESHOLD):
+    # Resultado do PoseLandmarker -> (pontos 2D (33, 4) para desenho, mascara, angulos, validos).
+    # No modo 3d os angulos vem dos pose_world_landmarks (coordenadas em metros, independentes do
+    # enquadramento da camera), com a mesma mascara de presenca dos landmarks normalizados.
+    # Os angulos saem direto dos objetos do landmarker; o array so e montado para o desenho
+    landmarks = result.pose_landmarks[0]
+    try:
+        tuplas, presentes = _tuplas_landmarks(landmarks, presence_threshold)
+    except (AttributeError, TypeError):
+        pontos, mascara = landmarks_para_array(landmarks, presence_threshold)
+        presentes = mascara.tolist()
+    else:
+        pontos, mascara = _tuplas_para_array(tuplas, presentes)
+    if modo == '3d':
+        angulos, validos = _angulos_escalar(result.pose_world_landmarks[0], presentes, 3)
+    else:
+        angulos, validos = _angulos_escalar(landmarks, presentes)
+    return pontos, mascara, angulos, validos
+
+def calcular_angulos_vetor(pontos, mascara, dims=2):
+    # pontos (..., 33, >=dims), mascara (..., 33) -> angulos (..., T) em graus e validos (..., T)
+    # dims=2 usa apenas x/y; dims=3 usa x/y/z
+    # um unico gather (..., T, 3, dims) em vez de um por vertice; a divisao so roda nos validos
+    num_ativos = len(_TRIPLETOS_DIMS[dims])
+    tripletos = TRIPLETOS_ARRAY[:num_ativos]
+    trios = pontos[..., tripletos, :dims]
+    ab = trios[..., 0, :] - trios[..., 1, :]
+    cb = trios[..., 2, :] - trios[..., 1, :]
+    produto_escalar = np.sum(ab * cb, axis=-1)
+    normas = np.sqrt(np.sum(ab * ab, axis=-1) * np.sum(cb * cb, axis=-1))
+    validos = np.all(mascara[..., tripletos], axis=-1) & (normas > 0)
+    cos_angulo = np.divide(produto_escalar, normas, out=np.zeros_like(produto_escalar), where=validos)
+    np.clip(cos_angulo, -1.0, 1.0, out=cos_angulo)
+    angulos = np.degrees(np.arccos(cos_angulo)).astype(np.float32, copy=False)
+    angulos[~validos] = np.nan
+    if num_ativos < NUM_TRIPLETOS:
+        # extras nao calculados neste modo: mesmo formato (..., T), NaN/False nas posicoes deles
+        forma = pontos.shape[:-2] + (NUM_TRIPLETOS,)
+        angulos_todos = np.full(forma, np.nan, dtype=np.float32)
+        validos_todos = np.zeros(forma, dtype=bool)
+        angulos_todos[..., :num_ativos] = angulos
+        validos_todos[..., :num_ativos] = validos
+        return angulos_todos, validos_todos
+    return angulos, validos
+
+def angulos_para_vetor(angulos):
+    # dicionario {"a-b-c": angulo} -> (angulos (T,), validos (T,)) na ordem de TRIPLETOS_ANGULOS
+    vetor = np.full(NUM_TRIPLETOS, np.nan, dtype=np.float32)
+    for chave, angulo in angulos.items():
+        idx = INDICE_CHAVE.get(chave)
+        if idx is not None and angulo is not None:
+            vetor[idx] = angulo
+    return vetor, ~np.isnan(vetor)
+
+def vetor_para_angulos(angulos, validos):
+    return {CHAVES_TRIPLETOS[i]: float(angulos[i]) for i in np.flatnonzero(validos)}
+
+def media_angulos_vetor(angulos, validos):
+    # media por tripleto de um conjunto de frames (N, T), ignorando os angulos invalidos
+    contagem = validos.sum(axis=0)
+    soma = np.where(validos, angulos, 0.0).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = (soma / contagem).astype(np.float32)
+    return media, contagem > 0
+
+# Versao vetorizada de comparar_angulos: retorna tambem o RMSE (None se nada foi comparado)
+def comparar_angulos_vetor(angulos_detec, validos_detec, angulos_salvos, validos_salvos,
+                           tipo_exercicio, debug=False):
+    obrigatorios = TRIPLETOS_OBRIGATORIOS.get(tipo_exercicio)
+    if obrigatorios is not None and np.any(validos_salvos & obrigatorios & ~validos_detec):
+        if debug:
+            print("Nao detectou bracos/pernas necessarios para o exercicio")
+        return False, [], None
+
+    comparados = validos_salvos & validos_detec
+    if not comparados.any():  # se nao detectou nada retorna falso
+        return False, [], None
+
+    # calcula erro quadratico entre os angulos
+    erros_quadraticos = (angulos_detec[comparados].astype(np.float64) - angulos_salvos[comparados]) ** 2
+    indices = np.flatnonzero(comparados)
+    tripletos_errados = [TRIPLETOS_ANGULOS[i] for i in indices[erros_quadraticos > POSE_ERROR_THRESHOLD ** 2]]
     # Root Mean Squared Error -> raiz da media dos erros quadraticos
-    rmse = np.sqrt(np.mean(valores_comparados))
+    rmse = float(np.sqrt(np.mean(erros_quadraticos)))
     if debug:
         print(f"RMSE: {rmse:.2f} (Threshold: {POSE_ERROR_THRESHOLD})")
-    return rmse < POSE_ERROR_THRESHOLD, tripletos_errados
\ No newline at end of file
+    return rmse < POSE_ERROR_THRESHOLD, tripletos_errados, rmse
+
+
+### API em dicionario (mantida como adaptador do motor de angulos)
+
+def calcular_angulos_frame(landmarks, debug=False):  # calcula o angulo de todos tripletos em um frame
+    # landmarks: objetos do landmarker (ou None para os filtrados); o dicionario so tem os tripletos detectados
+    presentes = [lm is not None for lm in landmarks]
+    angulos, validos = _angulos_escalar(landmarks, presentes)
+    if debug:
+        for chave, (a, b, c) in zip(CHAVES_TRIPLETOS, TRIPLETOS):
+            if not (presentes[a] and presentes[b] and presentes[c]):
+                print(f'\nNao conseguiu detectar a posicao do tripleto ({chave})')
+    return {chave: angulo for chave, angulo, valido in zip(CHAVES_TRIPLETOS, angulos.tolist(), validos.tolist()) if valido}
+
+def get_media_angulos(arr_frames):
+    if not arr_frames:
+        return {}
+    vetores = [angulos_para_vetor(frame) for frame in arr_frames]
+    angulos = np.stack([v[0] for v in vetores])
+    validos = np.stack([v[1] for v in vetores])
+    return vetor_para_angulos(*media_angulos_vetor(angulos, validos))
+
+# Compara os angulos de todos tripletos no frame, retorna o booleano indicando se 
+# a pose esta correta e uma lista com os tripletos que estao errados.
+# angulos_salvos: {"a-b-c": angulo} (so 2d) ou os conjuntos por modo ({'2d': {...}, '3d': {...}}),
+# de onde sai o do modo pedido; levanta ValueError se o conjunto desse modo nao existir
+def comparar_angulos(angulos_detec, angulos_salvos, tipo_exercicio, debug=False, modo='2d'):
+    if any(m in angulos_salvos for m in MODOS_ANGULO):
+        if modo not in angulos_salvos:
+            raise ValueError(f"Não há ângulos {modo.upper()} salvos para comparar")
+        angulos_salvos = angulos_salvos[modo]
+    elif modo != '2d':
+        raise ValueError(f"Ângulos salvos sem modo são 2D; para o modo '{modo}' use {{'{modo}': {{...}}}}")
+    pose_correta, tripletos_errados, _ = comparar_angulos_vetor(
+        *angulos_para_vetor(angulos_detec), *angulos_para_vetor(angulos_salvos), tipo_exercicio, debug
+    )
+    return pose_correta, tripletos_errados
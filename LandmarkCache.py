@@ -0,0 +1,180 @@
+### Cache de landmarks por video: a inferencia roda uma vez e o resultado fica salvo em um .npz
+### comprimido, identificado pelo hash do conteudo do video + modelo + configuracao de deteccao
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from AdaptiveInference import MODEL_PATHS
+from GeometryUtils import NUM_LANDMARKS, PRESENCE_THRESHOLD, calcular_angulos_vetor
+
+DIR_CACHE = ".landmarks_cache"
+EXTENSOES_VIDEO = ('.mp4', '.mov', '.avi', '.mkv', '.m4v')   # videos aceitos pelas CLIs de lote
+# Versao do formato salvo: entra na chave, entao caches de um formato antigo sao so ignorados
+# (2: colunas dos pose_world_landmarks adicionadas)
+VERSAO_CACHE = 2
+NUM_COLUNAS = 8    # [x, y, z, visibility, presence, x_mundo, y_mundo, z_mundo]
+
+# Configuracao padrao de deteccao usada no cadastro de exercicios: o mesmo PoseLandmarker (Tasks)
+# do monitor, para que os angulos de referencia e os ao vivo saiam do mesmo modelo
+CONFIG_PADRAO = {
+    'modelo': 'full',
+    'min_pose_detection_confidence': 0.5,
+    'min_pose_presence_confidence': 0.5,
+    'min_tracking_confidence': 0.5,
+}
+
+# Videos longos sao divididos em segmentos processados em paralelo, cada um com seu landmarker.
+# Cada segmento comeca SOBREPOSICAO_FRAMES antes do seu trecho e descarta esses frames: o modo
+# VIDEO usa o rastreamento dos frames anteriores, entao o trecho util ja comeca "aquecido".
+MIN_FRAMES_SEGMENTO = 300
+SOBREPOSICAO_FRAMES = 30
+
+
+def hash_video(video_entrada):
+    with open(video_entrada, 'rb') as f:
+        return hashlib.file_digest(f, 'sha1').hexdigest()
+
+
+def chave_cache(video_entrada, modelo, config):
+    config_serializada = json.dumps(config, sort_keys=True)
+    conteudo = f"{hash_video(video_entrada)}|{modelo}|{config_serializada}|v{VERSAO_CACHE}"
+    return hashlib.sha1(conteudo.encode()).hexdigest()
+
+
+def caminho_cache(video_entrada, modelo, config, dir_cache=DIR_CACHE):
+    return os.path.join(dir_cache, f"{chave_cache(video_entrada, modelo, config)}.npz")
+
+
+def _frame_vazio():
+    landmarks_frame = np.full((NUM_LANDMARKS, NUM_COLUNAS), np.nan, dtype=np.float32)
+    landmarks_frame[:, 3:5] = 0.0
+    return landmarks_frame
+
+
+# Roda o landmarker (modo VIDEO) nos frames [inicio, fim) do video (fim=None: ate o final),
+# comecando `aquecimento` frames antes. Retorna (landmarks (F, 33, 8), indices dos frames).
+def extrair_landmarks_segmento(video_entrada, inicio, fim, config, aquecimento=0):
+    import mediapipe as mp   # so carregado quando o video nao esta no cache
+
+    config = {**CONFIG_PADRAO, **config}
+    options = mp.tasks.vision.PoseLandmarkerOptions(
+        base_options=mp.tasks.BaseOptions(model_asset_path=MODEL_PATHS[config['modelo']]),
+        running_mode=mp.tasks.vision.RunningMode.VIDEO,
+        output_segmentation_masks=False,
+        num_poses=1,
+        min_pose_detection_confidence=config['min_pose_detection_confidence'],
+        min_pose_presence_confidence=config['min_pose_presence_confidence'],
+        min_tracking_confidence=config['min_tracking_confidence'],
+    )
+    cap = cv2.VideoCapture(video_entrada)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    primeiro = max(0, inicio - aquecimento)
+    if primeiro:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, primeiro)
+
+    landmarks_video = []
+    indices = []
+    with mp.tasks.vision.PoseLandmarker.create_from_options(options) as landmarker:
+        indice = primeiro
+        while fim is None or indice < fim:
+            sucesso, frame = cap.read()
+            if not sucesso:
+                break
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            # timestamps derivados do indice: monotonicos e iguais em todos os segmentos
+            result = landmarker.detect_for_video(mp_image, int(round(indice * 1000 / fps)))
+            if indice >= inicio:
+                landmarks_frame = _frame_vazio()
+                if result.pose_landmarks:
+                    landmarks_frame[:, :5] = [(lm.x, lm.y, lm.z, lm.visibility, lm.presence)
+                                              for lm in result.pose_landmarks[0]]
+                if result.pose_world_landmarks:
+                    landmarks_frame[:, 5:] = [(lm.x, lm.y, lm.z) for lm in result.pose_world_landmarks[0]]
+                landmarks_video.append(landmarks_frame)
+                indices.append(indice)
+            indice += 1
+    cap.release()
+
+    landmarks_video = np.stack(landmarks_video) if landmarks_video else np.zeros((0, NUM_LANDMARKS, NUM_COLUNAS), np.float32)
+    return landmarks_video, np.asarray(indices, dtype=np.int64)
+
+
+def dividir_segmentos(num_frames, workers, min_frames=MIN_FRAMES_SEGMENTO):
+    # [(inicio, fim)], o ultimo com fim=None para ler ate o final mesmo se a contagem do container errar
+    if num_frames <= 0 or workers <= 1:
+        return [(0, None)]
+    tamanho = max(min_frames, math.ceil(num_frames / workers))
+    inicios = list(range(0, num_frames, tamanho))
+    return [(inicio, inicios[i + 1] if i + 1 < len(inicios) else None) for i, inicio in enumerate(inicios)]
+
+
+# Decodifica o video e devolve os landmarks de todos os frames:
+# (F, 33, 8) = [x, y, z, visibility, presence, x_mundo, y_mundo, z_mundo] (NaN/0 quando nao
+# detectou; x/y/z_mundo sao os pose_world_landmarks, em metros), timestamps em ms e fps.
+# workers > 1 divide o video em segmentos sobrepostos processados em processos separados e junta
+# os resultados na ordem dos frames.
+def extrair_landmarks_video(video_entrada, config=None, workers=1):
+    config = {**CONFIG_PADRAO, **(config or {})}
+    cap = cv2.VideoCapture(video_entrada)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    segmentos = dividir_segmentos(num_frames, workers)
+    if len(segmentos) == 1:
+        partes = [extrair_landmarks_segmento(video_entrada, 0, None, config)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(segmentos))) as executor:
+            futuros = [executor.submit(extrair_landmarks_segmento, video_entrada, inicio, fim, config,
+                                       SOBREPOSICAO_FRAMES)
+                       for inicio, fim in segmentos]
+            partes = [futuro.result() for futuro in futuros]
+
+    landmarks_video = np.concatenate([landmarks for landmarks, _ in partes])
+    indices = np.concatenate([indices for _, indices in partes])
+    return landmarks_video, indices * 1000.0 / fps, fps
+
+
+def angulos_landmarks_video(landmarks_video, modo='2d'):
+    # (F, 33, 8) -> angulos (F, T) e validos (F, T) em uma unica chamada vetorizada.
+    # modo '3d' usa os pose_world_landmarks, com a mesma mascara de presenca do 2d
+    mascara = landmarks_video[..., 4] >= PRESENCE_THRESHOLD
+    if modo == '3d':
+        return calcular_angulos_vetor(landmarks_video[..., 5:8], mascara, dims=3)
+    return calcular_angulos_vetor(landmarks_video[..., [0, 1, 2, 4]], mascara)
+
+
+def carregar_landmarks(caminho):
+    with np.load(caminho) as dados:
+        return dados['landmarks'], dados['timestamps'], float(dados['fps'])
+
+
+def salvar_landmarks(caminho, landmarks_video, timestamps, fps, modelo, config):
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    # grava em um temporario e renomeia, para que processos paralelos nunca leiam um arquivo pela metade
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as f:
+        np.savez_compressed(f, landmarks=landmarks_video, timestamps=timestamps, fps=fps,
+                            modelo=modelo, config=json.dumps(config, sort_keys=True))
+    os.replace(temporario, caminho)
+
+
+# Ponto de entrada para todo codigo que precisa dos landmarks de um video: le do cache se
+# existir, senao roda o modelo uma vez e salva o resultado
+# (workers: processos usados na extracao; nao altera o resultado, entao nao entra na chave do cache)
+def obter_landmarks_video(video_entrada, config=None, dir_cache=DIR_CACHE, usar_cache=True, workers=1):
+    config = {**CONFIG_PADRAO, **(config or {})}
+    modelo = f"pose_landmarker_{config['modelo']}"
+    caminho = caminho_cache(video_entrada, modelo, config, dir_cache)
+    if usar_cache and os.path.isfile(caminho):
+        return carregar_landmarks(caminho)
+
+    landmarks_video, timestamps, fps = extrair_landmarks_video(video_entrada, config, workers)
+    if usar_cache:
+        salvar_landmarks(caminho, landmarks_video, timestamps, fps, modelo, config)
+    return landmarks_video, timestamps, fps
@@ -0,0 +1,112 @@
+### Sincronizacao incremental da biblioteca de exercicios: uma thread consulta periodicamente os
+### mtimes dos YAMLs de exercises_output e das pastas de imagens de exercises_input e, so para os
+### exercicios que mudaram, recompila o YAML (ExerciseStore) fora do loop do monitor. O loop
+### recolhe os nomes alterados com coletar() e troca os dados de referencia entre dois frames,
+### sem fechar o landmarker nem a camera.
+import os
+import threading
+
+from ExerciseStore import DIR_COMPILADOS, DIR_EXERCICIOS, compilar_exercicio, listar_exercicios
+from PoseIndex import construir_indice
+
+DIR_IMAGENS = "exercises_input"
+INTERVALO_VERIFICACAO = 1.0   # segundos entre verificacoes
+
+
+class VigiaBiblioteca:
+    # Polling de mtimes em vez de inotify: funciona igual em Linux, macOS e Windows e, com poucas
+    # dezenas de exercicios, cada verificacao custa alguns stat() a cada segundo.
+    # modo_indice: se informado ('2d'/'3d'), reconstroi tambem o indice de poses (modo reconhecer)
+    # a cada alteracao, na thread do vigia.
+    def __init__(self, dir_exercicios=DIR_EXERCICIOS, dir_imagens=DIR_IMAGENS, dir_compilados=DIR_COMPILADOS,
+                 intervalo=INTERVALO_VERIFICACAO, modo_indice=None):
+        self.dir_exercicios = dir_exercicios
+        self.dir_imagens = dir_imagens
+        self.dir_compilados = dir_compilados
+        self.intervalo = intervalo
+        self.modo_indice = modo_indice
+        self._assinaturas = self._varrer()
+        self._falhas = {}     # nome -> assinatura do YAML que nao compilou (so e tentado de novo se mudar)
+        self.exercicios = tuple(sorted(self._assinaturas))   # trocada inteira, nunca alterada no lugar
+        self.indice = None
+        self._alterados = set()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="vigia_biblioteca", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def _assinatura(self, nome):
+        # (mtime e tamanho do YAML, arquivos da pasta de imagens com seus mtimes)
+        stat_yaml = os.stat(os.path.join(self.dir_exercicios, f"{nome}.yaml"))
+        try:
+            with os.scandir(os.path.join(self.dir_imagens, nome)) as entradas:
+                imagens = tuple(sorted((e.name, e.stat().st_mtime_ns) for e in entradas if e.is_file()))
+        except FileNotFoundError:
+            imagens = ()
+        return stat_yaml.st_mtime_ns, stat_yaml.st_size, imagens
+
+    def _varrer(self):
+        assinaturas = {}
+        for nome in listar_exercicios(self.dir_exercicios):
+            try:
+                assinaturas[nome] = self._assinatura(nome)
+            except FileNotFoundError:   # removido entre o listdir e o stat
+                continue
+        return assinaturas
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar()
+            except Exception as e:   # um erro de leitura nao pode derrubar o vigia
+                print(f"Erro ao verificar a biblioteca de exercícios: {e}")
+
+    # Compara com a ultima varredura e recompila so os exercicios novos ou alterados. Um YAML que
+    # falha ao compilar (ex.: salvo pela metade) mantem os dados anteriores ate ser salvo de novo.
+    def verificar(self):
+        atuais = self._varrer()
+        alterados = set()
+        for nome, assinatura in list(atuais.items()):
+            if assinatura == self._assinaturas.get(nome):
+                continue
+            if assinatura != self._falhas.get(nome):
+                try:
+                    compilar_exercicio(nome, self.dir_exercicios, self.dir_compilados)
+                except Exception as e:
+                    print(f"Exercício '{nome}' não recarregado: {e}")
+                    self._falhas[nome] = assinatura
+                else:
+                    self._falhas.pop(nome, None)
+                    alterados.add(nome)
+                    continue
+            if nome in self._assinaturas:
+                atuais[nome] = self._assinaturas[nome]
+            else:
+                del atuais[nome]
+        removidos = set(self._assinaturas) - set(atuais)
+        if not alterados and not removidos:
+            return set()
+
+        indice = construir_indice(self.dir_exercicios, self.dir_compilados, self.modo_indice, sorted(atuais)) \
+            if self.modo_indice is not None else None
+        self._assinaturas = atuais
+        with self._lock:
+            self.exercicios = tuple(sorted(atuais))
+            if indice is not None:
+                self.indice = indice
+            self._alterados |= alterados | removidos
+        return alterados | removidos
+
+    # Nomes dos exercicios alterados, adicionados ou removidos desde a ultima chamada
+    def coletar(self):
+        with self._lock:
+            alterados, self._alterados = self._alterados, set()
+        return alterados
+
+    def fechar(self):
+        self._parar.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.intervalo + 1.0)
@@ -1,21 +1,26 @@
-import cv2
 import time
+INICIO_PROCESSO = time.perf_counter()   # referencia do relatorio de inicializacao (--startup_report)
+
+import cv2
 import argparse
 import os
-import yaml
-import numpy as np
-import mediapipe as mp
-from mediapipe.tasks import python
-from mediapipe.tasks.python import vision
-from mediapipe.framework.formats import landmark_pb2
-
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
-import pygame
-
-from GeometryUtils import calcular_angulos_frame, comparar_angulos, get_media_angulos
-from DrawingUtils import draw_skeleton, draw_stats, load_ref_img
-
-PRESENCE_THRESHOLD = 0.5   # Limite de presença para considerar um landmark válido
+from concurrent.futures import ThreadPoolExecutor
+
+# mediapipe (modelo), pygame (audio) e yaml (so ao recompilar exercicios) sao importados sob demanda,
+# nas threads de inicializacao, para o menu aparecer sem esperar por eles
+from GeometryUtils import calcular_angulos_resultado, MODOS_ANGULO, NUM_TRIPLETOS, POSE_ERROR_THRESHOLD
+from DrawingUtils import draw_skeleton_array, draw_stats, CacheImagensReferencia, Compositor
+from Pipeline import PipelinePose
+from ExerciseStore import listar_exercicios, carregar_exercicio
+from PoseIndex import ReconhecedorExercicio, construir_indice
+from ExerciseSession import SessaoExercicio
+from AdaptiveInference import GovernadorLatencia, LandmarkersPorTier, MODEL_PATHS
+from RoiTracking import RastreadorROI
+from FilterUtils import FILTROS, criar_filtro
+from Telemetry import Telemetria, TELEMETRIA_NULA, MarcosInicializacao
+from SessionRecording import DIR_SESSOES, GravadorSessao
+from Events import BarramentoEventos, ReprodutorAudio, AvisosTela, RegistroEventos, POSE_CONCLUIDA
+from LibraryWatcher import DIR_IMAGENS, INTERVALO_VERIFICACAO, VigiaBiblioteca
 
 LARGURA_JANELA = 1920
 ALTURA_JANELA = 1080
@@ -23,196 +28,365 @@ ALTURA_JANELA = 1080
 largura_esquerda = int(LARGURA_JANELA * 2 / 3)
 largura_direita = LARGURA_JANELA - largura_esquerda  # 1/3 da largura
 
+MARGEM_PRECISAO_ALTA = 1.5  # RMSE abaixo de POSE_ERROR_THRESHOLD * margem liga a precisao alta do governador
 
 DEBUG = False
 
-if __name__ == "__main__":   
+# Carrega os angulos de referencia compilados (matriz pose x tripleto) e comeca a decodificar
+# as imagens de referencia em segundo plano
+def preparar_exercicio(exercicio_nome, modo='2d'):
+    exercicio = carregar_exercicio(exercicio_nome, modo=modo)
+    exercicio_img_dir = os.path.join(DIR_IMAGENS, exercicio_nome)
+    exercicio_imgs = sorted(os.listdir(exercicio_img_dir))
+    cache_ref = CacheImagensReferencia(exercicio_img_dir, exercicio_imgs, (largura_direita, ALTURA_JANELA))
+    cache_ref.prefetch_todas()
+    return exercicio, cache_ref
+
+if __name__ == "__main__":
+    inicializacao = MarcosInicializacao(INICIO_PROCESSO)
+    inicializacao.marcar("imports")
+
     # Parser de argumentos
     parser = argparse.ArgumentParser(description="Estimativa de pose com MediaPipe Tasks API")
     parser.add_argument("--model", choices=["lite", "full", "heavy"], default="full",
                         help="Escolha o modelo: lite, full ou heavy (padrão: full)")
+    parser.add_argument("--live_stream", action="store_true",
+                        help="Usa o modo LIVE_STREAM (detect_async) em vez do modo VIDEO")
+    parser.add_argument("--pipeline_stats", action="store_true",
+                        help="Imprime periodicamente o FPS de cada estagio e a ocupacao das filas")
+    parser.add_argument("--target_fps", type=float,
+                        help="Ativa o governador de latencia: troca de modelo (ate o de --model) e pula "
+                             "inferencias para manter esse FPS")
+    parser.add_argument("--roi", action="store_true",
+                        help="Roda o landmarker so na regiao da pose do frame anterior (volta ao frame inteiro se perder a pose)")
+    parser.add_argument("--roi_max_side", type=int,
+                        help="Reduz o recorte da ROI para que o maior lado tenha no maximo esse tamanho em pixels")
+    parser.add_argument("--filter", choices=FILTROS, default="one_euro",
+                        help="Filtro temporal dos angulos, aplicado em todo frame (none = media de 5 frames durante o hold)")
+    parser.add_argument("--mode", choices=["sequencial", "livre", "reconhecer"], default="sequencial",
+                        help="sequencial: poses na ordem cadastrada; livre: poses em qualquer ordem; "
+                             "reconhecer: identifica o exercicio automaticamente (poses em qualquer ordem)")
+    parser.add_argument("--angles", choices=MODOS_ANGULO, default="2d",
+                        help="2d: angulos no plano da imagem; 3d: angulos dos pose_world_landmarks (independentes "
+                             "da posicao da camera; o exercicio precisa ter sido cadastrado com os angulos 3D)")
+    parser.add_argument("--telemetry_jsonl",
+                        help="Grava periodicamente p50/p95/p99 de cada estagio neste arquivo JSONL")
+    parser.add_argument("--telemetry_port", type=int,
+                        help="Expoe as metricas por estagio em http://127.0.0.1:<porta>/metrics (formato Prometheus)")
+    parser.add_argument("--telemetry_interval", type=float, default=10.0,
+                        help="Intervalo em segundos entre gravacoes do JSONL (padrao: 10)")
+    parser.add_argument("--record", action="store_true",
+                        help="Grava a sessao (landmarks, angulos, RMSE, pose, reps e timer por frame) para replay")
+    parser.add_argument("--record_dir", default=DIR_SESSOES,
+                        help=f"Diretorio das sessoes gravadas (padrao: {DIR_SESSOES})")
+    parser.add_argument("--event_log",
+                        help="Acrescenta os eventos da sessao (hold, pose, repeticao, tripletos errados) neste JSONL")
+    parser.add_argument("--watch_interval", type=float, default=INTERVALO_VERIFICACAO,
+                        help="Segundos entre verificacoes de exercises_output/exercises_input: exercicios editados "
+                             "sao recarregados sem reiniciar o monitor (0 desativa; padrao: 1)")
+    parser.add_argument("--startup_report", nargs="?", const="",
+                        help="Imprime o tempo de cada etapa da inicializacao ao exibir o primeiro frame "
+                             "(e acrescenta o resumo no JSONL informado, se houver)")
     args = parser.parse_args()
+    if args.target_fps and args.live_stream:
+        parser.error("--target_fps não é suportado junto com --live_stream")
+    if args.roi and args.live_stream:
+        parser.error("--roi não é suportado junto com --live_stream (os recortes usam o modo IMAGE)")
 
-    # Mapeamento do modelo
-    model_paths = {
-        "lite": "models/pose_landmarker_lite.task",
-        "full": "models/pose_landmarker_full.task",
-        "heavy": "models/pose_landmarker_heavy.task"
-    }
-    model_path = model_paths[args.model]
-
-    # Carregamento de exercícios cadastrados
-    exercicios = [f for f in os.listdir("exercises_output")]
+    # Lista os exercícios cadastrados (os dados so sao carregados para o exercicio escolhido)
+    exercicios = listar_exercicios()
     if not exercicios:
         print("ERRO: Nenhum exercício cadastrado")
         exit()
 
-    exercicios_dados = [] # array que contem os angulos de todos exercicios cadastrados
-    for nome_arquivo in exercicios:
-        caminho = os.path.join("exercises_output", nome_arquivo)
-        with open(caminho, "r") as f:
-            dados = yaml.safe_load(f)
-            exercicios_dados.append(dados)
-
-    # Menu de escolha de exercício
-    for idx, nome in enumerate(exercicios):
-        print(f"{idx+1}. {nome}")
-
-    dados_exercicio_selecionado = {}
-    exercicio_imgs = []
-
-    while True:
+    # Exercicios adicionados/editados com o monitor aberto sao recompilados em segundo plano e
+    # trocados entre dois frames (o indice do modo reconhecer tambem e reconstruido no vigia)
+    vigia = None
+    if args.watch_interval > 0:
+        vigia = VigiaBiblioteca(intervalo=args.watch_interval,
+                                modo_indice=args.angles if args.mode == "reconhecer" else None).iniciar()
+
+    # Etapas lentas da inicializacao rodam em paralelo enquanto o menu espera a escolha:
+    # carregar o mediapipe + modelo e abrir a camera (o audio inicializa na thread do seu assinante)
+    def carregar_landmarker():
+        import mediapipe as mp
+        VisionRunningMode = mp.tasks.vision.RunningMode
+
+        # o pipeline e criado depois, mas o callback do LIVE_STREAM so e chamado apos pipeline.iniciar
+        def callback(result, output_image, timestamp_ms):
+            pipeline.callback(result, output_image, timestamp_ms)
+
+        # com --roi o modo e IMAGE: cada recorte e inferido sem o rastreamento entre frames do VIDEO
+        if args.live_stream:
+            modo_execucao = VisionRunningMode.LIVE_STREAM
+        elif args.roi:
+            modo_execucao = VisionRunningMode.IMAGE
+        else:
+            modo_execucao = VisionRunningMode.VIDEO
+
+        def criar_landmarker(modelo):
+            options = mp.tasks.vision.PoseLandmarkerOptions(
+                base_options=mp.tasks.BaseOptions(model_asset_path=MODEL_PATHS[modelo]),
+                running_mode=modo_execucao,
+                output_segmentation_masks=False,
+                num_poses=1,
+                result_callback=callback if args.live_stream else None
+            )
+            return mp.tasks.vision.PoseLandmarker.create_from_options(options)
+
+        return criar_landmarker, criar_landmarker(args.model)
+
+    def abrir_camera():
+        cap = cv2.VideoCapture(0)
+        if not cap.isOpened():
+            raise RuntimeError("Erro ao abrir a webcam.")
+        return cap
+
+    inicializador = ThreadPoolExecutor(max_workers=2, thread_name_prefix="inicializacao")
+    futuro_landmarker = inicializador.submit(inicializacao.tarefa("modelo", carregar_landmarker))
+    futuro_camera = inicializador.submit(inicializacao.tarefa("camera", abrir_camera))
+    inicializador.shutdown(wait=False)
+
+    # Eventos da sessao: audio, avisos na tela e log rodam nas threads dos assinantes (o mixer e
+    # inicializado e o som decodificado na thread do audio, fora do caminho do primeiro frame)
+    barramento = BarramentoEventos()
+    audio = ReprodutorAudio({POSE_CONCLUIDA: 'success_bell.mp3'})
+    barramento.assinar(audio, tipos=audio.caminhos.keys(), nome="audio",
+                       iniciar=inicializacao.tarefa("audio", audio.iniciar))
+    avisos = AvisosTela()
+    avisos.assinar(barramento)
+    if args.event_log:
+        RegistroEventos(args.event_log).assinar(barramento)
+
+    exercicio = None
+    cache_ref = None
+    reconhecedor = None
+    # exercicios que nao abriram (ex.: sem pasta de imagens); so sao tentados de novo quando o
+    # vigia avisar que mudaram
+    indisponiveis = set()
+
+    if args.mode == "reconhecer":
+        # o exercicio e escolhido pela pose mais proxima entre todas as cadastradas
+        reconhecedor = ReconhecedorExercicio(construir_indice(modo=args.angles))
+        print(f"Modo de reconhecimento: {len(reconhecedor.indice)} poses em {len(exercicios)} exercícios")
+    else:
+        # Menu de escolha de exercício
+        for idx, nome in enumerate(exercicios):
+            print(f"{idx+1}. {nome}")
+        inicializacao.marcar("menu")
+
+    while reconhecedor is None:
         try:
+            espera = time.perf_counter()
             escolha = int(input("\nDigite o número do exercício desejado: "))
-            if 1 <= escolha <= len(exercicios):
-                # Add angulos do exercicio em um dicionario (chave = frame valor = angulos)
-                dados_exercicio_selecionado = exercicios_dados[escolha-1]
-
-                # Pega todas imagens do exercicio
-                exercicio_selecionado = exercicios[escolha-1]
-                exercicio_nome = exercicio_selecionado.replace('.yaml', '')
-                exercicio_img_dir = os.path.join("exercises_input", exercicio_nome)
-                exercicio_imgs = sorted([
-                    f for f in os.listdir(exercicio_img_dir)
-                ])
-
-                print(f"Exercício selecionado: {exercicio_nome}")
-                break
-            else:
-                print("Número inválido, tente novamente.")
+            inicializacao.espera_usuario += time.perf_counter() - espera
         except ValueError:
             print("Entrada inválida, digite um número.")
-
-    tipo_exercicio = dados_exercicio_selecionado.get('tipo_exercicio')
-    tempo_alongamento = dados_exercicio_selecionado.get('tempo_alongamento') # segundos
-    angulos_ref = dados_exercicio_selecionado.get('frames', {})
-
-    # Configurações do PoseLandmarker
-    BaseOptions = mp.tasks.BaseOptions
-    PoseLandmarker = mp.tasks.vision.PoseLandmarker
-    PoseLandmarkerOptions = mp.tasks.vision.PoseLandmarkerOptions
-    VisionRunningMode = mp.tasks.vision.RunningMode
-
-    # Cria o detector
-    options = PoseLandmarkerOptions(
-        base_options=BaseOptions(model_asset_path=model_path),
-        running_mode=VisionRunningMode.VIDEO,
-        output_segmentation_masks=False,
-        num_poses=1
-    )
+            continue
+        if not 1 <= escolha <= len(exercicios):
+            print("Número inválido, tente novamente.")
+            continue
+        if exercicios[escolha-1] in indisponiveis:
+            print(f"Exercício '{exercicios[escolha-1]}' indisponível, escolha outro.")
+            continue
+        try:
+            exercicio, cache_ref = preparar_exercicio(exercicios[escolha-1], args.angles)
+        except (ValueError, OSError) as e:   # sem os angulos do modo pedido (--angles 3d) ou sem imagens
+            print(f"Exercício '{exercicios[escolha-1]}' não pôde ser aberto: {e}")
+            indisponiveis.add(exercicios[escolha-1])
+            continue
+        print(f"Exercício selecionado: {exercicio.nome}")
+        break
+
+    inicializacao.marcar("exercicio_carregado")
+
+    # Telemetria por estagio (desligada = objeto nulo, sem custo no loop)
+    telemetria = Telemetria() if args.telemetry_jsonl or args.telemetry_port else TELEMETRIA_NULA
+    if args.telemetry_jsonl:
+        telemetria.iniciar_exportacao_jsonl(args.telemetry_jsonl, args.telemetry_interval)
+    if args.telemetry_port:
+        telemetria.servir_prometheus(args.telemetry_port)
 
     # Inicia a webcam e configuracoes da janela do opencv
     window_name = "Computer Vision Physiotherapy"
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     cv2.resizeWindow(window_name, LARGURA_JANELA, ALTURA_JANELA)
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Erro ao abrir a webcam.")
+    try:
+        cap = futuro_camera.result()
+        criar_landmarker, landmarker = futuro_landmarker.result()
+    except Exception as e:
+        print(e)
         exit()
+    inicializacao.marcar("camera_e_modelo_prontos")
+
+    # Captura e inferencia rodam em threads separadas; este loop so compoe e exibe
+    governador = GovernadorLatencia(args.target_fps, args.model) if args.target_fps else None
+    rastreador = RastreadorROI(lado_max=args.roi_max_side) if args.roi else None
+    pipeline = PipelinePose(cap, live_stream=args.live_stream, governador=governador, rastreador=rastreador,
+                            telemetria=telemetria)
+
+    with landmarker:
+
+        def nova_sessao(exercicio):
+            return SessaoExercicio(exercicio, DEBUG, criar_filtro(args.filter, NUM_TRIPLETOS),
+                                   ordem_livre=args.mode != "sequencial", barramento=barramento)
+
+        # uma gravacao por sessao: no modo de reconhecimento, cada exercicio reconhecido abre outra
+        def nova_gravacao(exercicio, anterior=None):
+            if anterior is not None:
+                anterior.fechar()
+            if not args.record:
+                return None
+            return GravadorSessao.para_exercicio(exercicio, args.record_dir,
+                                                 {'modelo': args.model, 'filtro': args.filter, 'modo': args.mode})
+
+        # Troca de exercicio sem fechar o landmarker nem a camera (reconhecimento ou teclas n/p).
+        # preparar_exercicio levanta ValueError se o exercicio nao tiver os angulos de --angles.
+        def trocar_exercicio(nome, cache_anterior, gravador_anterior):
+            novo, novo_cache = preparar_exercicio(nome, args.angles)
+            if cache_anterior is not None:
+                cache_anterior.fechar()
+            return novo, novo_cache, nova_sessao(novo), nova_gravacao(novo, gravador_anterior)
+
+        sessao = nova_sessao(exercicio) if exercicio is not None else None
+        gravador = nova_gravacao(exercicio) if exercicio is not None else None
+        compositor = Compositor(LARGURA_JANELA, ALTURA_JANELA, largura_esquerda)
+
+        if governador is not None:
+            # os outros modelos so sao carregados se o governador precisar deles
+            landmarkers = LandmarkersPorTier(criar_landmarker, {args.model: landmarker})
+            pipeline.iniciar(landmarkers)
+        else:
+            pipeline.iniciar(landmarker)
+        ultimo_relatorio = time.time()
 
-    # Configuracao de feedback sonoro
-    pygame.mixer.init()
-    success_sound = pygame.mixer.Sound('success_bell.mp3')
-
-    inicio_alongamento = 0
-    timer_alongamento = 0
-
-    with PoseLandmarker.create_from_options(options) as landmarker:
-
-        pose_index = 0 # Index da pose atual sendo usada na comparacao
-        ref_img_loaded = load_ref_img(exercicio_img_dir, exercicio_imgs, pose_index)
-        reps = 0 # Contador de repetições
-
-        conjunto_frames = []
-        holding = False
-        
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Erro ao capturar frame.")
-                break
-
-            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
-            timestamp_ms = int(time.time() * 1000)
-
-            ### DETECCAO SINCRONA:
-            result = landmarker.detect_for_video(mp_image, timestamp_ms=timestamp_ms)
-
-            if result.pose_landmarks:
-                landmarks = result.pose_landmarks[0]
-                landmark_list = landmark_pb2.NormalizedLandmarkList()
-                landmarks_filtrados = []
-                for lm in landmarks:
-                    landmark = landmark_pb2.NormalizedLandmark(
-                        x=lm.x, y=lm.y, z=lm.z,
-                        visibility=lm.visibility, presence=lm.presence
-                    )
-                    landmark_list.landmark.append(landmark)
-
-                    if lm.presence >= PRESENCE_THRESHOLD:
-                        landmarks_filtrados.append(lm)
+            item = pipeline.fila_resultado.get(timeout=1.0)
+            if item is None:
+                if not pipeline.ativo():
+                    print(pipeline.erro or "Pipeline encerrado.")
+                    break
+                continue
+            frame, timestamp_ms, result = item
+            pontos = angulos_detect = validos_detect = None
+            pose_concluida = False
+
+            alterados = vigia.coletar() if vigia is not None else None
+            if alterados:
+                exercicios = list(vigia.exercicios)
+                indisponiveis -= alterados
+                if reconhecedor is not None and vigia.indice is not None:
+                    reconhecedor.indice = vigia.indice
+                if exercicio is not None and exercicio.nome in alterados and exercicio.nome in exercicios:
+                    # o YAML ja foi recompilado pelo vigia: aqui so abre o .npy e lista as imagens
+                    try:
+                        novo, novo_cache = preparar_exercicio(exercicio.nome, args.angles)
+                    except (ValueError, OSError) as e:
+                        print(e)
                     else:
-                        landmarks_filtrados.append(None)
-                
-                angulos_detect_frame = calcular_angulos_frame(landmarks_filtrados)
-                angulos_ref_frame = angulos_ref.get(f'frame_{pose_index}', {})
-
-                if holding:
-                    conjunto_frames.append(angulos_detect_frame)
-
-                if not holding or len(conjunto_frames) == 5:
-                    if len(conjunto_frames) > 0:
-                        angulos_detect_frame = get_media_angulos(conjunto_frames)
-                        conjunto_frames = []
+                        cache_ref.fechar()
+                        exercicio, cache_ref = novo, novo_cache
+                        sessao.trocar_exercicio(exercicio)
+                        print(f"Exercício '{exercicio.nome}' recarregado ({exercicio.num_poses} poses)")
 
-                    pose_correta, tripletos_errados = comparar_angulos(
-                        angulos_detect_frame, angulos_ref_frame, tipo_exercicio, DEBUG
-                    )
-
-                draw_skeleton(frame, landmarks_filtrados, tripletos_errados)
-
-                if pose_correta:
-                    if inicio_alongamento == 0:
-                        inicio_alongamento = time.time()
-                        holding = True
-                    else:
-                        timer_alongamento = time.time() - inicio_alongamento
-                        if timer_alongamento >= tempo_alongamento:
-                            pose_index += 1
-                            success_sound.play()
-                            inicio_alongamento = 0
-                            timer_alongamento = 0
-                            holding = False
-                            conjunto_frames = []
-                            if pose_index >= len(angulos_ref):
-                                pose_index = 0
-                                reps += 1
-
-                            ref_img_loaded = load_ref_img(exercicio_img_dir, exercicio_imgs, pose_index)
+            if result.pose_landmarks:
+                with telemetria.span("angulos"):
+                    pontos, mascara, angulos_detect, validos_detect = calcular_angulos_resultado(result, args.angles)
+
+                # no modo de reconhecimento, troca de exercicio so fora de um hold
+                if reconhecedor is not None and (sessao is None or not sessao.holding):
+                    reconhecido = reconhecedor.atualizar(angulos_detect, validos_detect)
+                    if reconhecido is not None and reconhecido not in indisponiveis and (
+                            exercicio is None or reconhecido != exercicio.nome):
+                        try:
+                            exercicio, cache_ref, sessao, gravador = trocar_exercicio(reconhecido, cache_ref, gravador)
+                        except (ValueError, OSError) as e:
+                            print(f"Exercício reconhecido '{reconhecido}' não pôde ser aberto: {e}")
+                            indisponiveis.add(reconhecido)
+                        else:
+                            print(f"Exercício reconhecido: {reconhecido}")
+
+                if sessao is not None:
+                    # timestamp da captura do frame (e nao o instante em que ele chegou aqui)
+                    with telemetria.span("comparacao"):
+                        pose_concluida = sessao.atualizar(angulos_detect, validos_detect, timestamp_ms / 1000)
+                    if governador is not None:
+                        # perto do limite de acerto a precisao importa mais que o FPS
+                        governador.precisao_alta = sessao.holding or (
+                            sessao.rmse is not None and sessao.rmse < POSE_ERROR_THRESHOLD * MARGEM_PRECISAO_ALTA)
+
+                with telemetria.span("esqueleto"):
+                    draw_skeleton_array(frame, pontos, mascara, sessao.tripletos_errados if sessao is not None else [])
+
+            if gravador is not None:
+                with telemetria.span("gravacao"):
+                    gravador.registrar(timestamp_ms, sessao, pontos, angulos_detect, validos_detect, pose_concluida)
+
+            # Junta img de exec (espelhada) com de ref lado a lado no canvas pre-alocado
+            with telemetria.span("composicao"):
+                if sessao is not None:
+                    ref_img = cache_ref.obter(sessao.pose_index)
+                    if ref_img is not None:  # se ainda nao carregou, mantem a imagem anterior
+                        # a chave usa o cache (e nao o nome): um exercicio recarregado troca a imagem
+                        compositor.atualizar_referencia((cache_ref, sessao.pose_index), ref_img)
+                frame_display = compositor.compor(frame)
+            with telemetria.span("stats"):
+                if sessao is not None:
+                    draw_stats(compositor.painel_camera, sessao.pose_index, exercicio.num_poses, sessao.reps,
+                               sessao.timer_alongamento, compositor.escala)
                 else:
-                    inicio_alongamento = 0
-                    timer_alongamento = 0
-                    holding = False
-                    conjunto_frames = []
-
-            frame = cv2.flip(frame, 1) # inverte no eixo x por causa do espelhamento da camera
+                    cv2.putText(compositor.painel_camera, "Procurando exercicio...", (20, 80),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 255), 3)
+                aviso = avisos.mensagem()
+                if aviso is not None:
+                    texto, cor = aviso
+                    cv2.putText(compositor.painel_camera, texto, (20, compositor.painel_camera.shape[0] - 40),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1.5, cor, 3)
+
+            # Mostra a imagem e le o teclado
+            with telemetria.span("exibicao"):
+                cv2.imshow(window_name, frame_display)
+                tecla = cv2.waitKey(1) & 0xFF
+            pipeline.medidor_exibicao.tick()
+            if "primeiro_frame" not in inicializacao.marcos:
+                inicializacao.marcar("primeiro_frame")
+                if args.startup_report is not None:
+                    print(inicializacao.relatorio())
+                    if args.startup_report:
+                        inicializacao.exportar_jsonl(args.startup_report)
+
+            if args.pipeline_stats and time.time() - ultimo_relatorio >= 2.0:
+                print(pipeline.relatorio())
+                ultimo_relatorio = time.time()
 
-            num_poses = len(angulos_ref)
-            draw_stats(frame, pose_index, num_poses, reps, timer_alongamento)
-
-            ref_img_resized = cv2.resize(ref_img_loaded, (largura_direita , ALTURA_JANELA), interpolation=cv2.INTER_LINEAR)
-            
-            # Junta img de exec com de ref lado a lado
-            frame_redimensionado = cv2.resize(frame, (largura_esquerda, ALTURA_JANELA), interpolation=cv2.INTER_LINEAR)
-            frame_display = np.hstack((frame_redimensionado, ref_img_resized))
-
-            # Mostra a imagem
-            cv2.imshow(window_name, frame_display)
             # Verifica se a tecla 'q' foi pressionada para sair
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            if tecla == ord('q'):
                 break
-
+            # n/p: proximo/anterior exercicio da biblioteca (fora do modo reconhecer)
+            if tecla in (ord('n'), ord('p')) and reconhecedor is None and exercicios:
+                atual = exercicios.index(exercicio.nome) if exercicio.nome in exercicios else -1
+                proximo = exercicios[(atual + (1 if tecla == ord('n') else -1)) % len(exercicios)]
+                try:
+                    exercicio, cache_ref, sessao, gravador = trocar_exercicio(proximo, cache_ref, gravador)
+                except (ValueError, OSError) as e:
+                    print(e)
+                else:
+                    print(f"Exercício selecionado: {exercicio.nome}")
+
+        # para as threads antes de fechar o landmarker que elas usam
+        pipeline.parar()
+        if governador is not None:
+            landmarkers.fechar()
+        if gravador is not None:
+            gravador.fechar()
+            print(f"Sessão gravada em '{gravador.diretorio}' ({gravador.num_frames} frames)")
+        barramento.fechar()
+
+    if vigia is not None:
+        vigia.fechar()
+    if cache_ref is not None:
+        cache_ref.fechar()
+    telemetria.fechar()
     cap.release()
     cv2.destroyAllWindows()
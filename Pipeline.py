@@ -0,0 +1,266 @@
+### Pipeline em estagios (captura -> inferencia -> composicao/exibicao) ligados por filas
+### limitadas onde o frame mais recente sempre vence
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from Telemetry import TELEMETRIA_NULA
+
+
+class FilaRecente:
+    # Fila limitada: quando cheia, descarta o item mais antigo para manter so os frames mais novos
+    def __init__(self, tamanho_max=1):
+        self._itens = deque(maxlen=tamanho_max)
+        self._cond = threading.Condition()
+        self.descartados = 0
+        self.fechada = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._itens) == self._itens.maxlen:
+                self.descartados += 1
+            self._itens.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._itens and not self.fechada:
+                self._cond.wait(timeout)
+            if not self._itens:
+                return None
+            return self._itens.popleft()
+
+    def fechar(self):
+        with self._cond:
+            self.fechada = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class MedidorFPS:
+    # FPS medido sobre uma janela deslizante dos ultimos instantes registrados
+    def __init__(self, janela=30):
+        self._instantes = deque(maxlen=janela)
+        self._lock = threading.Lock()
+
+    def tick(self):
+        with self._lock:
+            self._instantes.append(time.perf_counter())
+
+    def fps(self):
+        with self._lock:
+            if len(self._instantes) < 2:
+                return 0.0
+            duracao = self._instantes[-1] - self._instantes[0]
+            return (len(self._instantes) - 1) / duracao if duracao > 0 else 0.0
+
+
+class Captura:
+    # Le frames de um cv2.VideoCapture em uma thread propria e publica (frame, timestamp_ms)
+    # em uma FilaRecente, com timestamps estritamente crescentes (exigencia do modo VIDEO)
+    def __init__(self, cap, fila, parar, medidor=None, telemetria=TELEMETRIA_NULA):
+        self.cap = cap
+        self.fila = fila
+        self.medidor = medidor or MedidorFPS()
+        self.telemetria = telemetria
+        self.erro = None
+        self._parar = parar
+        self.thread = threading.Thread(target=self._loop, name="captura", daemon=True)
+
+    def iniciar(self):
+        self.thread.start()
+
+    def _loop(self):
+        ultimo_timestamp = -1
+        while not self._parar.is_set():
+            with self.telemetria.span("captura"):
+                ret, frame = self.cap.read()
+            if not ret:
+                self.erro = "Erro ao capturar frame."
+                break
+            timestamp_ms = max(int(time.time() * 1000), ultimo_timestamp + 1)
+            ultimo_timestamp = timestamp_ms
+            self.fila.put((frame, timestamp_ms))
+            self.medidor.tick()
+        self._parar.set()
+        self.fila.fechar()
+
+
+class EscritorVideo:
+    # Grava frames em um cv2.VideoWriter em uma thread propria. Ao contrario da FilaRecente, a fila
+    # nunca descarta: escrever() bloqueia se a gravacao ficar tamanho_fila frames para tras.
+    # O frame passado nao deve ser reutilizado por quem chama ate ser gravado.
+    def __init__(self, caminho, fps, tamanho, fourcc='mp4v', tamanho_fila=32):
+        self._writer = cv2.VideoWriter(caminho, cv2.VideoWriter_fourcc(*fourcc), fps, tamanho)
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self.frames = 0
+        self._thread = threading.Thread(target=self._loop, name="escritor_video", daemon=True)
+        self._thread.start()
+
+    def escrever(self, frame):
+        self._fila.put(frame)
+
+    def _loop(self):
+        while True:
+            frame = self._fila.get()
+            if frame is None:
+                break
+            self._writer.write(frame)
+            self.frames += 1
+
+    def fechar(self):
+        self._fila.put(None)
+        self._thread.join()
+        self._writer.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class PipelinePose:
+    # Captura e inferencia rodam em threads proprias; a composicao/exibicao fica na thread
+    # principal (cv2.imshow precisa dela) consumindo fila_resultado.
+    # Com live_stream=True a inferencia usa o modo LIVE_STREAM (detect_async + callback).
+    # Com um governador (AdaptiveInference.GovernadorLatencia) o modelo e a frequencia de
+    # inferencia sao ajustados ao FPS alvo; nesse caso iniciar() recebe um LandmarkersPorTier.
+    # Com um rastreador (RoiTracking.RastreadorROI) a inferencia roda so na regiao da pose; o
+    # landmarker precisa estar no modo IMAGE (detect): a caixa muda a cada frame e o rastreamento
+    # entre frames do modo VIDEO seguiria pontos de um recorte que ja nao e o mesmo.
+    def __init__(self, cap, live_stream=False, tamanho_fila=1, governador=None, rastreador=None,
+                 telemetria=TELEMETRIA_NULA):
+        self.cap = cap
+        self.live_stream = live_stream
+        self.governador = governador
+        self.rastreador = rastreador
+        self.telemetria = telemetria
+        self.fila_captura = FilaRecente(tamanho_fila)
+        self.fila_resultado = FilaRecente(tamanho_fila)
+        self.medidor_captura = MedidorFPS()
+        self.medidor_inferencia = MedidorFPS()
+        self.medidor_exibicao = MedidorFPS()
+        self._parar = threading.Event()
+        self._captura = Captura(cap, self.fila_captura, self._parar, self.medidor_captura, telemetria)
+        self._threads = []
+        self._landmarker = None
+        self._mp = None
+        # frames aguardando o resultado do detect_async, indexados pelo timestamp
+        self._pendentes = {}
+        self._pendentes_lock = threading.Lock()
+
+    def iniciar(self, landmarker):
+        # o mediapipe ja foi carregado por quem criou o landmarker; importar este modulo nao o carrega
+        import mediapipe as mp
+        self._mp = mp
+        self._landmarker = landmarker
+        alvo_inferencia = self._loop_inferencia_async if self.live_stream else self._loop_inferencia
+        self._threads = [
+            self._captura.thread,
+            threading.Thread(target=alvo_inferencia, name="inferencia", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def parar(self):
+        self._parar.set()
+        self.fila_captura.fechar()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self.fila_resultado.fechar()
+
+    def ativo(self):
+        return not self._parar.is_set() and all(t.is_alive() for t in self._threads)
+
+    @property
+    def erro(self):
+        return self._captura.erro
+
+    def _proximo_frame(self):
+        while not self._parar.is_set():
+            item = self.fila_captura.get(timeout=0.5)
+            if item is not None:
+                return item
+        return None
+
+    def _preparar_imagem(self, frame):
+        mp = self._mp
+        with self.telemetria.span("conversao"):
+            if self.rastreador is None:
+                return mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)), None
+            imagem_rgb, caixa = self.rastreador.preparar(frame)
+            return mp.Image(image_format=mp.ImageFormat.SRGB, data=imagem_rgb), caixa
+
+    def _loop_inferencia(self):
+        ultimo_result = None
+        while True:
+            item = self._proximo_frame()
+            if item is None:
+                break
+            frame, timestamp_ms = item
+
+            if self.governador is not None and ultimo_result is not None and not self.governador.deve_inferir():
+                # frame pulado pelo governador: mantem os landmarks do ultimo frame inferido
+                self.fila_resultado.put((frame, timestamp_ms, ultimo_result))
+                continue
+
+            if self.governador is None:
+                landmarker = self._landmarker
+            else:
+                landmarker = self._landmarker.obter(self.governador.tier)
+            mp_image, caixa = self._preparar_imagem(frame)
+            inicio = time.perf_counter()
+            if self.rastreador is None:
+                result = landmarker.detect_for_video(mp_image, timestamp_ms=timestamp_ms)
+            else:
+                result = landmarker.detect(mp_image)
+            duracao_ms = (time.perf_counter() - inicio) * 1000
+            self.telemetria.registrar("inferencia", duracao_ms)
+            if self.governador is not None:
+                self.governador.registrar(duracao_ms)
+            if self.rastreador is not None:
+                self.rastreador.processar_resultado(result, caixa, frame.shape)
+            ultimo_result = result
+            self.medidor_inferencia.tick()
+            self.fila_resultado.put((frame, timestamp_ms, result))
+
+    def _loop_inferencia_async(self):
+        while True:
+            item = self._proximo_frame()
+            if item is None:
+                break
+            frame, timestamp_ms = item
+            mp_image, caixa = self._preparar_imagem(frame)
+            with self._pendentes_lock:
+                self._pendentes[timestamp_ms] = (frame, caixa)
+            with self.telemetria.span("inferencia_envio"):
+                self._landmarker.detect_async(mp_image, timestamp_ms)
+
+    # Callback do modo LIVE_STREAM (passado em PoseLandmarkerOptions.result_callback)
+    def callback(self, result, output_image, timestamp_ms):
+        with self._pendentes_lock:
+            pendente = self._pendentes.pop(timestamp_ms, None)
+            # frames descartados internamente pelo mediapipe nunca recebem callback
+            for ts in [ts for ts in self._pendentes if ts < timestamp_ms]:
+                del self._pendentes[ts]
+        if pendente is None:
+            return
+        frame, caixa = pendente
+        if self.rastreador is not None:
+            self.rastreador.processar_resultado(result, caixa, frame.shape)
+        self.medidor_inferencia.tick()
+        self.fila_resultado.put((frame, timestamp_ms, result))
+
+    def relatorio(self):
+        governador = f" | {self.governador.relatorio()}" if self.governador is not None else ""
+        return (f"captura {self.medidor_captura.fps():5.1f} fps (fila {len(self.fila_captura)}, "
+                f"descartados {self.fila_captura.descartados}) | "
+                f"inferencia {self.medidor_inferencia.fps():5.1f} fps (fila {len(self.fila_resultado)}, "
+                f"descartados {self.fila_resultado.descartados}) | "
+                f"exibicao {self.medidor_exibicao.fps():5.1f} fps{governador}")
@@ -0,0 +1,95 @@
+### Indice de todas as poses de referencia cadastradas: os vetores de angulos ficam empilhados em
+### uma matriz (poses x tripletos) e cada consulta calcula o RMSE contra todas de uma vez
+import numpy as np
+
+from ExerciseStore import carregar_exercicio, listar_exercicios, modos_exercicio, DIR_EXERCICIOS, DIR_COMPILADOS
+from GeometryUtils import NUM_TRIPLETOS, POSE_ERROR_THRESHOLD, TRIPLETOS_OBRIGATORIOS
+
+FRAMES_RECONHECIMENTO = 15   # frames seguidos com o mesmo exercicio para reconhece-lo
+
+
+class IndicePoses:
+    def __init__(self, exercicios):
+        self.nomes = [e.nome for e in exercicios]
+        self.exercicio_ids = np.concatenate(
+            [np.full(e.num_poses, i, dtype=np.intp) for i, e in enumerate(exercicios)] or [np.zeros(0, np.intp)])
+        self.pose_ids = np.concatenate(
+            [np.arange(e.num_poses, dtype=np.intp) for e in exercicios] or [np.zeros(0, np.intp)])
+        num_tripletos = NUM_TRIPLETOS
+        angulos = [np.asarray(e.angulos, dtype=np.float32) for e in exercicios]
+        angulos = np.concatenate(angulos) if angulos else np.zeros((0, num_tripletos), np.float32)
+        self.validos = ~np.isnan(angulos)
+        self.angulos = np.nan_to_num(angulos)
+        # tripletos que cada pose exige que sejam detectados (pelo tipo do seu exercicio)
+        vazio = np.zeros(num_tripletos, dtype=bool)
+        self.obrigatorios = np.array([TRIPLETOS_OBRIGATORIOS.get(exercicios[i].tipo_exercicio, vazio)
+                                      for i in self.exercicio_ids], dtype=bool).reshape(-1, num_tripletos)
+        self.obrigatorios &= self.validos
+        # buffers de trabalho pre-alocados, reaproveitados em toda consulta
+        self._diferencas = np.empty(self.angulos.shape, dtype=np.float32)
+        self._rmse = np.empty(len(self.angulos), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.angulos)
+
+    # Retorna os k vizinhos mais proximos como [(nome_exercicio, pose_index, rmse)], do melhor
+    # para o pior. permitidos: mascara opcional (num_poses,) restringindo as poses candidatas.
+    def consultar(self, angulos, validos, k=5, permitidos=None):
+        if not len(self):
+            return []
+        dif = self._diferencas
+        np.subtract(self.angulos, np.nan_to_num(angulos), out=dif)
+        np.abs(dif, out=dif)
+        # distancia circular: angulos que diferem por perto de 360 graus estao proximos
+        np.minimum(dif, 360.0 - dif, out=dif)
+        np.square(dif, out=dif)
+        comparados = self.validos & validos
+        dif[~comparados] = 0.0
+
+        contagem = comparados.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.sqrt(dif.sum(axis=1) / contagem, out=self._rmse)
+        rmse = self._rmse
+        # mesmas regras de comparar_angulos_vetor: nada comparado ou tripleto obrigatorio ausente
+        rmse[(contagem == 0) | (self.obrigatorios & ~validos).any(axis=1)] = np.inf
+        if permitidos is not None:
+            rmse[~permitidos] = np.inf
+
+        k = min(k, len(rmse))
+        candidatos = np.argpartition(rmse, k - 1)[:k]
+        candidatos = candidatos[np.argsort(rmse[candidatos])]
+        return [(self.nomes[self.exercicio_ids[i]], int(self.pose_ids[i]), float(rmse[i]))
+                for i in candidatos if np.isfinite(rmse[i])]
+
+
+# modo: conjunto de angulos indexado ('2d' ou '3d'); exercicios sem esse conjunto ficam de fora.
+# nomes: exercicios indexados (padrao: todos os de dir_exercicios)
+def construir_indice(dir_exercicios=DIR_EXERCICIOS, dir_compilados=DIR_COMPILADOS, modo='2d', nomes=None):
+    nomes = listar_exercicios(dir_exercicios) if nomes is None else nomes
+    return IndicePoses([carregar_exercicio(nome, dir_exercicios, dir_compilados, modo)
+                        for nome in nomes
+                        if modo in modos_exercicio(nome, dir_exercicios, dir_compilados)])
+
+
+class ReconhecedorExercicio:
+    # Reconhece o exercicio em execucao: o exercicio da pose mais proxima precisa ficar abaixo
+    # do limite de erro por `frames` frames seguidos para ser aceito
+    def __init__(self, indice, frames=FRAMES_RECONHECIMENTO, limite=POSE_ERROR_THRESHOLD):
+        self.indice = indice
+        self.frames = frames
+        self.limite = limite
+        self.melhor = None        # (nome, pose_index, rmse) do ultimo frame
+        self._candidato = None
+        self._contagem = 0
+
+    # Retorna o nome do exercicio reconhecido, ou None enquanto nao houver um estavel
+    def atualizar(self, angulos, validos):
+        vizinhos = self.indice.consultar(angulos, validos, k=1)
+        self.melhor = vizinhos[0] if vizinhos else None
+        nome = self.melhor[0] if self.melhor and self.melhor[2] < self.limite else None
+        if nome is not None and nome == self._candidato:
+            self._contagem += 1
+        else:
+            self._candidato = nome
+            self._contagem = 1 if nome is not None else 0
+        return self._candidato if self._contagem >= self.frames else None
@@ -0,0 +1,231 @@
+### Modo servidor: varias cameras/videos (uma estacao por paciente) em um unico processo,
+### com um numero limitado de inferencias simultaneas
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from AdaptiveInference import MODEL_PATHS
+from DrawingUtils import CacheImagensReferencia, Compositor, draw_skeleton_array, draw_stats
+from Events import BarramentoEventos, ReprodutorAudio, POSE_CONCLUIDA
+from ExerciseSession import SessaoExercicio
+from ExerciseStore import carregar_exercicio, listar_exercicios
+from FilterUtils import FILTROS, criar_filtro
+from GeometryUtils import MODOS_ANGULO, NUM_TRIPLETOS, calcular_angulos_resultado
+from Pipeline import Captura, FilaRecente, MedidorFPS
+
+LARGURA_JANELA = 1920
+ALTURA_JANELA = 1080
+
+
+class PoolLandmarkers:
+    # Um PoseLandmarker em modo VIDEO por estacao: o rastreamento entre frames e os timestamps
+    # monotonicos sao por stream, entao uma instancia nao pode atender pacientes diferentes. O pool
+    # limita quantas inferencias rodam ao mesmo tempo (tamanho), nao quantos modelos ficam carregados.
+    def __init__(self, model_path, tamanho):
+        self._options = mp.tasks.vision.PoseLandmarkerOptions(
+            base_options=mp.tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=mp.tasks.vision.RunningMode.VIDEO,
+            output_segmentation_masks=False,
+            num_poses=1
+        )
+        self._vagas = threading.Semaphore(tamanho)
+        self._todos = []
+        self._lock = threading.Lock()
+
+    # Landmarker de uma estacao (fechado junto com o pool)
+    def criar(self):
+        landmarker = mp.tasks.vision.PoseLandmarker.create_from_options(self._options)
+        with self._lock:
+            self._todos.append(landmarker)
+        return landmarker
+
+    # Bloqueia ate haver uma vaga de inferencia livre
+    def detectar(self, landmarker, mp_image, timestamp_ms):
+        with self._vagas:
+            return landmarker.detect_for_video(mp_image, timestamp_ms)
+
+    def fechar(self):
+        with self._lock:
+            for landmarker in self._todos:
+                landmarker.close()
+            self._todos.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class Estacao:
+    # Uma fonte de video com seu exercicio e estado de sessao proprios. A captura roda em uma
+    # thread e o processamento (inferencia no pool + sessao + composicao) em outra.
+    def __init__(self, indice, fonte, nome_exercicio, pool, tamanho_tela, barramento=None, filtro='one_euro',
+                 modo='2d'):
+        self.indice = indice
+        self.fonte = fonte
+        self.nome = f"{indice + 1}: {nome_exercicio} ({fonte})"
+        self.pool = pool
+        # tudo que pode falhar (exercicio sem imagens ou sem o modo pedido, fonte invalida) antes de
+        # criar o landmarker e as threads do cache da estacao
+        self.exercicio = carregar_exercicio(nome_exercicio, modo=modo)
+        img_dir = os.path.join("exercises_input", nome_exercicio)
+        imagens = sorted(os.listdir(img_dir))
+        self.cap = cv2.VideoCapture(int(fonte) if str(fonte).isdigit() else fonte)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Erro ao abrir a fonte de vídeo '{fonte}'.")
+        self.landmarker = pool.criar()
+
+        self.sessao = SessaoExercicio(self.exercicio, filtro=criar_filtro(filtro, NUM_TRIPLETOS),
+                                      barramento=barramento)
+        largura, altura = tamanho_tela
+        largura_camera = int(largura * 2 / 3)
+        self.cache_ref = CacheImagensReferencia(img_dir, imagens, (largura - largura_camera, altura))
+        self.cache_ref.prefetch_todas()
+        self.compositor = Compositor(largura, altura, largura_camera)
+
+        self.fila_captura = FilaRecente()
+        self.fila_tela = FilaRecente()    # telas prontas para a thread principal exibir
+        self.medidor = MedidorFPS()
+        self._parar = threading.Event()
+        self._captura = Captura(self.cap, self.fila_captura, self._parar)
+        self._thread = threading.Thread(target=self._loop, name=f"estacao_{indice}", daemon=True)
+
+    def iniciar(self):
+        self._captura.iniciar()
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self.fila_captura.fechar()
+        self._thread.join(timeout=2.0)
+        self._captura.thread.join(timeout=2.0)
+        self.cache_ref.fechar()
+        self.cap.release()
+
+    def ativa(self):
+        return self._thread.is_alive()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            item = self.fila_captura.get(timeout=0.5)
+            if item is None:
+                if self.fila_captura.fechada:
+                    break
+                continue
+            frame, timestamp_ms = item
+
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            # timestamps de cada estacao sao monotonicos (Captura), independente das outras
+            result = self.pool.detectar(self.landmarker, mp_image, timestamp_ms)
+
+            if result.pose_landmarks:
+                pontos, mascara, angulos, validos = calcular_angulos_resultado(result, self.exercicio.modo)
+                self.sessao.atualizar(angulos, validos, timestamp_ms / 1000)
+                draw_skeleton_array(frame, pontos, mascara, self.sessao.tripletos_errados)
+
+            ref_img = self.cache_ref.obter(self.sessao.pose_index)
+            if ref_img is not None:
+                self.compositor.atualizar_referencia(self.sessao.pose_index, ref_img)
+            tela = self.compositor.compor(frame)
+            draw_stats(self.compositor.painel_camera, self.sessao.pose_index, self.exercicio.num_poses,
+                       self.sessao.reps, self.sessao.timer_alongamento, self.compositor.escala)
+            # copia para a exibicao nao ver a proxima composicao pela metade
+            self.fila_tela.put(tela.copy())
+            self.medidor.tick()
+
+
+def tamanho_tile(num_estacoes, largura=LARGURA_JANELA, altura=ALTURA_JANELA):
+    colunas = math.ceil(math.sqrt(num_estacoes))
+    linhas = math.ceil(num_estacoes / colunas)
+    return colunas, linhas, (largura // colunas, altura // linhas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitoramento de várias estações em um único processo")
+    parser.add_argument("--sources", nargs="+", required=True,
+                        help="Índices de câmera ou caminhos de vídeo, um por estação")
+    parser.add_argument("--exercises", nargs="+", required=True,
+                        help="Exercício de cada estação (um único nome vale para todas)")
+    parser.add_argument("--model", choices=["lite", "full", "heavy"], default="full",
+                        help="Modelo do pose landmarker (padrão: full)")
+    parser.add_argument("--pool_size", type=int,
+                        help="Número de inferências simultâneas (padrão: min(estações, núcleos))")
+    parser.add_argument("--filter", choices=FILTROS, default="one_euro", help="Filtro temporal dos ângulos")
+    parser.add_argument("--angles", choices=MODOS_ANGULO, default="2d",
+                        help="Ângulos 2D (imagem) ou 3D (pose_world_landmarks) na comparação")
+    parser.add_argument("--grid", action="store_true", help="Mostra todas as estações em uma única janela em grade")
+    args = parser.parse_args()
+
+    exercicios = args.exercises * len(args.sources) if len(args.exercises) == 1 else args.exercises
+    if len(exercicios) != len(args.sources):
+        parser.error("--exercises deve ter um nome por fonte (ou um único nome para todas)")
+    disponiveis = listar_exercicios()
+    for nome in exercicios:
+        if nome not in disponiveis:
+            parser.error(f"exercício '{nome}' não cadastrado")
+
+    pool_size = args.pool_size or min(len(args.sources), os.cpu_count() or 1)
+
+    # um barramento para todas as estacoes: o audio toca na thread do assinante
+    barramento = BarramentoEventos()
+    ReprodutorAudio({POSE_CONCLUIDA: 'success_bell.mp3'}).assinar(barramento)
+
+    colunas, linhas, tamanho_tela = tamanho_tile(len(args.sources)) if args.grid else (1, 1, (LARGURA_JANELA, ALTURA_JANELA))
+    grade = np.zeros((tamanho_tela[1] * linhas, tamanho_tela[0] * colunas, 3), dtype=np.uint8) if args.grid else None
+
+    with PoolLandmarkers(MODEL_PATHS[args.model], pool_size) as pool:
+        # uma estacao que nao abre (sem imagens, sem o modo de angulos pedido, fonte invalida) e
+        # informada e fica de fora; as outras seguem
+        estacoes = []
+        for i, (fonte, nome) in enumerate(zip(args.sources, exercicios)):
+            try:
+                estacoes.append(Estacao(i, fonte, nome, pool, tamanho_tela, barramento, args.filter, args.angles))
+            except (ValueError, OSError, RuntimeError) as e:
+                print(f"Estação {i + 1} ({nome}, fonte {fonte}) não iniciada: {e}")
+        if not estacoes:
+            barramento.fechar()
+            sys.exit(1)
+
+        janelas = ["Computer Vision Physiotherapy"] if args.grid else [e.nome for e in estacoes]
+        for janela in janelas:
+            cv2.namedWindow(janela, cv2.WINDOW_NORMAL)
+
+        for estacao in estacoes:
+            estacao.iniciar()
+
+        ultimo_relatorio = time.time()
+        while any(e.ativa() for e in estacoes):
+            for estacao in estacoes:
+                tela = estacao.fila_tela.get(timeout=0.005)
+                if tela is None:
+                    continue
+                if args.grid:
+                    linha, coluna = divmod(estacao.indice, colunas)
+                    altura, largura = tela.shape[:2]
+                    grade[linha * altura:(linha + 1) * altura, coluna * largura:(coluna + 1) * largura] = tela
+                else:
+                    cv2.imshow(estacao.nome, tela)
+            if args.grid:
+                cv2.imshow(janelas[0], grade)
+
+            if time.time() - ultimo_relatorio >= 5.0:
+                print(" | ".join(f"{e.nome}: {e.medidor.fps():.1f} fps" for e in estacoes))
+                ultimo_relatorio = time.time()
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+        # para as estacoes antes de fechar os landmarkers do pool
+        for estacao in estacoes:
+            estacao.parar()
+        barramento.fechar()
+
+    cv2.destroyAllWindows()
@@ -1,76 +1,82 @@
 import cv2
 import os
+import glob
+import shutil
 import sys
+import tempfile
 import argparse
-import mediapipe as mp
-import subprocess
-from DrawingUtils import draw_skeleton
+import warnings
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from AdaptiveInference import TIERS
+from DrawingUtils import draw_skeleton_array
+from GeometryUtils import CHAVES_TRIPLETOS, POSE_ERROR_THRESHOLD, PRESENCE_THRESHOLD
+from LandmarkCache import CONFIG_PADRAO, EXTENSOES_VIDEO, obter_landmarks_video, angulos_landmarks_video
+from Pipeline import EscritorVideo
 
-def processar_video(video_entrada, video_saida):
-    mp_pose = mp.solutions.pose
+VELOCIDADE_PLATO = 20.0     # graus/s: abaixo disso o corpo e considerado parado
+DURACAO_MIN_PLATO = 0.5     # segundos minimos parado para considerar uma pose-chave
 
+# Gera o video com o esqueleto desenhado a partir dos landmarks do cache (sem rodar o modelo).
+# A codificacao do video de saida roda na thread do EscritorVideo; exibir mostra o overlay.
+def processar_video(video_entrada, video_saida, landmarks_video, exibir=False):
     output_dir = os.path.dirname(video_saida)
     os.makedirs(output_dir, exist_ok=True)
 
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+    cap = cv2.VideoCapture(video_entrada)
 
-        cap = cv2.VideoCapture(video_entrada)
+    largura = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    altura = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
 
-        largura = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        altura = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(video_saida, fourcc, fps, (largura, altura))
-
-        while cap.isOpened():
+    with EscritorVideo(video_saida, fps, (largura, altura)) as escritor:
+        for landmarks_frame in landmarks_video:
             sucesso, frame = cap.read()
             if not sucesso:
                 print("Fim do vídeo ou erro na leitura.")
                 break
 
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-            resultados = pose.process(frame_rgb)
+            frame = draw_skeleton_array(frame, landmarks_frame, landmarks_frame[:, 4] >= PRESENCE_THRESHOLD, [])
+            escritor.escrever(frame)
 
-            if resultados.pose_landmarks:
-                landmarks_filtrados = list(resultados.pose_landmarks.landmark)
-                frame = draw_skeleton(frame, landmarks_filtrados, [])
-
-            out.write(frame)
-
-            cv2.imshow('MediaPipe Pose', frame)
-            if cv2.waitKey(5) & 0xFF == 27:  # Pressione ESC para sair
-                break
+            if exibir:
+                cv2.imshow('MediaPipe Pose', frame)
+                if cv2.waitKey(5) & 0xFF == 27:  # Pressione ESC para sair
+                    break
 
-        cap.release()
-        out.release()
+    cap.release()
+    if exibir:
         cv2.destroyAllWindows()
     print(f"Vídeo processado salvo em: {video_saida}")
 
-def selecionar_frames_de_video(video_original, video_processado, nome_exercicio):
-    if not os.path.isfile(video_original) or not os.path.isfile(video_processado):
-        print(f"Erro: Um dos arquivos de video não foi encontrado.")
-        return
+# Seletor interativo de frames; o esqueleto e desenhado na hora a partir dos landmarks do cache.
+# Retorna os indices (no video) dos frames salvos.
+def selecionar_frames_de_video(video_original, nome_exercicio, landmarks_video):
+    if not os.path.isfile(video_original):
+        print(f"Erro: O arquivo de video não foi encontrado.")
+        return []
 
     pasta_saida = f"./exercises_input/{nome_exercicio}"
-    
+
+    cap_original = cv2.VideoCapture(video_original)
+
+    if not cap_original.isOpened():
+        print("Erro ao abrir o arquivo de vídeo.")
+        return []
+
+    # os frames novos ficam numa pasta temporaria ao lado e so substituem os do cadastro anterior
+    # se algum for salvo: sair sem salvar mantem as imagens que o YAML antigo referencia
     try:
-        os.makedirs(pasta_saida, exist_ok=True)
+        pasta_temp = criar_pasta_temporaria(pasta_saida)
         print(f"Frames selecionados serão salvos em '{pasta_saida}/'")
     except OSError as e:
         print(f"Erro ao criar o diretório: {e}")
-        return
-    
-    cap_original = cv2.VideoCapture(video_original)
-    cap_processado = cv2.VideoCapture(video_processado)
-
-    if not cap_original.isOpened() or not cap_processado.isOpened():
-        print("Erro ao abrir o arquivo de vídeo.")
-        return
+        cap_original.release()
+        return []
 
     frame_atual_idx = 0
     frames_salvos_count = 0
+    frames_salvos = []
     
     print("\n--- Controles ---")
     print("  [S]   -> Salvar o frame atual")
@@ -80,12 +86,15 @@ def selecionar_frames_de_video(video_original, video_processado, nome_exercicio)
 
     while True:
         ret_original, frame_original = cap_original.read()
-        ret_processado, frame_processado = cap_processado.read()
 
-        if not ret_original or not ret_processado:
+        if not ret_original or frame_atual_idx >= len(landmarks_video):
             print("Fim do vídeo.")
             break
 
+        landmarks_frame = landmarks_video[frame_atual_idx]
+        frame_processado = draw_skeleton_array(frame_original.copy(), landmarks_frame,
+                                               landmarks_frame[:, 4] >= PRESENCE_THRESHOLD, [])
+
         cv2.putText(
             frame_processado,
             f'Frame: {frame_atual_idx}',
@@ -102,12 +111,13 @@ def selecionar_frames_de_video(video_original, video_processado, nome_exercicio)
 
         if key == ord('s'):
             nome_arquivo = f"frame_{frames_salvos_count:04d}.jpg"
-            caminho_completo = os.path.join(pasta_saida, nome_arquivo)
+            caminho_completo = os.path.join(pasta_temp, nome_arquivo)
             
             cv2.imwrite(caminho_completo, frame_original)
             
             print(f"-> Frame {frame_atual_idx} salvo como '{nome_arquivo}'")
             frames_salvos_count += 1
+            frames_salvos.append(frame_atual_idx)
 
         elif key == ord('q'):
             print("Saindo do programa.")
@@ -116,45 +126,220 @@ def selecionar_frames_de_video(video_original, video_processado, nome_exercicio)
         frame_atual_idx += 1
 
     cap_original.release()
-    cap_processado.release()
     cv2.destroyAllWindows()
+    if frames_salvos:
+        substituir_frames(pasta_temp, pasta_saida)
+    else:
+        shutil.rmtree(pasta_temp, ignore_errors=True)
     print(f"\nConcluído! {frames_salvos_count} frames foram salvos na pasta '{pasta_saida}'.")
+    return frames_salvos
+
+
+### Cadastro headless: uma unica decodificacao por video, poses-chave escolhidas automaticamente
+
+# Escolhe as poses-chave como platos estaveis do vetor de angulos: trechos em que a velocidade
+# angular media fica abaixo de VELOCIDADE_PLATO por pelo menos DURACAO_MIN_PLATO segundos.
+# De cada plato pega o frame de menor velocidade; um plato com a mesma pose de qualquer pose ja
+# escolhida (ex.: repeticoes A-B-A-B-A) e unido a ela, entao cada pose aparece uma unica vez.
+def selecionar_poses_chave(angulos, validos, fps, max_poses=None,
+                           velocidade_plato=VELOCIDADE_PLATO, duracao_min=DURACAO_MIN_PLATO):
+    if len(angulos) < 2:
+        return []
+    diffs = np.abs(np.diff(angulos, axis=0)) * fps
+    diffs[~(validos[1:] & validos[:-1])] = np.nan
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # frames sem nenhum angulo valido
+        velocidade = np.nanmean(diffs, axis=1)
+    velocidade = np.concatenate([[velocidade[0]], velocidade])
+    velocidade[np.isnan(velocidade)] = np.inf  # frames sem deteccao nunca sao plato
+
+    # suaviza com media movel de ~1/3 de segundo (os inf continuam quebrando o plato)
+    # (janela limitada ao numero de frames: maior que ele, a convolucao 'same' devolveria mais amostras)
+    janela = max(1, min(len(velocidade), int(round(fps / 3))))
+    velocidade = np.convolve(velocidade, np.ones(janela) / janela, mode='same')
+    # nas bordas a convolucao 'same' media com zeros: esses frames parecem parados sem estar
+    borda = janela // 2
+    if borda:
+        velocidade[:borda] = np.inf
+        velocidade[-borda:] = np.inf
 
+    parado = velocidade < velocidade_plato
+    bordas = np.flatnonzero(np.diff(np.concatenate([[0], parado.astype(np.int8), [0]])))
+    platos = [(inicio, fim) for inicio, fim in zip(bordas[::2], bordas[1::2]) if fim - inicio >= duracao_min * fps]
+
+    poses = []  # [indice do frame, duracao do plato], na ordem em que cada pose aparece pela primeira vez
+    for inicio, fim in platos:
+        indice = inicio + int(np.argmin(velocidade[inicio:fim]))
+        for pose in poses:
+            comparados = validos[indice] & validos[pose[0]]
+            if not comparados.any():
+                continue
+            rmse = np.sqrt(np.mean((angulos[indice, comparados] - angulos[pose[0], comparados]) ** 2))
+            if rmse < POSE_ERROR_THRESHOLD:
+                # pose repetida: fica com o plato mais longo, na posicao da primeira ocorrencia
+                if fim - inicio > pose[1]:
+                    pose[:] = [indice, fim - inicio]
+                break
+        else:
+            poses.append([indice, fim - inicio])
+
+    if max_poses is not None and len(poses) > max_poses:
+        # mantem os platos mais longos, preservando a ordem das poses
+        mantidas = sorted(sorted(range(len(poses)), key=lambda i: -poses[i][1])[:max_poses])
+        poses = [poses[i] for i in mantidas]
+    return [int(indice) for indice, _ in poses]
+
+def _frames_yaml(angulos_poses, validos_poses):
+    return {
+        f'frame_{i}': {CHAVES_TRIPLETOS[t]: float(angulos[t]) for t in np.flatnonzero(validos)}
+        for i, (angulos, validos) in enumerate(zip(angulos_poses, validos_poses))
+    }
+
+# 'frames' guarda os angulos 2D; 'frames_3d' (opcional) os dos pose_world_landmarks das mesmas poses
+def gerar_yaml_exercicio(caminho_saida, tipo_exercicio, tempo_alongamento, angulos_poses, validos_poses,
+                         angulos_3d=None, validos_3d=None):
+    import yaml   # carregado so na hora de salvar, para a CLI abrir rapido
+    dados = {
+        'tipo_exercicio': tipo_exercicio,
+        'tempo_alongamento': tempo_alongamento,
+        'frames': _frames_yaml(angulos_poses, validos_poses),
+    }
+    if angulos_3d is not None:
+        dados['frames_3d'] = _frames_yaml(angulos_3d, validos_3d)
+    os.makedirs(os.path.dirname(caminho_saida) or '.', exist_ok=True)
+    with open(caminho_saida, 'w') as f:
+        yaml.safe_dump(dados, f, sort_keys=False)
+
+# Remove os frames de um cadastro anterior, para as imagens de referencia nao misturarem poses
+def limpar_frames(pasta):
+    for caminho in glob.glob(os.path.join(pasta, "frame_*.jpg")):
+        os.remove(caminho)
+
+# Pasta oculta ao lado da do exercicio (mesmo disco, para o os.replace) com os frames de um novo cadastro
+def criar_pasta_temporaria(pasta_saida):
+    pasta_pai = os.path.dirname(pasta_saida) or '.'
+    os.makedirs(pasta_pai, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f".{os.path.basename(pasta_saida)}-", dir=pasta_pai)
+
+# Move os frames novos (pasta_temp) para a pasta do exercicio, no lugar dos do cadastro anterior
+def substituir_frames(pasta_temp, pasta_saida):
+    os.makedirs(pasta_saida, exist_ok=True)
+    limpar_frames(pasta_saida)
+    for caminho in sorted(glob.glob(os.path.join(pasta_temp, "frame_*.jpg"))):
+        os.replace(caminho, os.path.join(pasta_saida, os.path.basename(caminho)))
+    shutil.rmtree(pasta_temp, ignore_errors=True)
+
+def salvar_frames_chave(video_entrada, indices_frames, pasta_saida):
+    # busca direto os frames escolhidos, sem decodificar o video inteiro de novo; como no seletor,
+    # os do cadastro anterior so sao trocados se algum frame novo for lido
+    pasta_temp = criar_pasta_temporaria(pasta_saida)
+    salvos = 0
+    cap = cv2.VideoCapture(video_entrada)
+    for i, indice in enumerate(indices_frames):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, indice)
+        sucesso, frame = cap.read()
+        if sucesso:
+            cv2.imwrite(os.path.join(pasta_temp, f"frame_{i:04d}.jpg"), frame)
+            salvos += 1
+    cap.release()
+    if salvos:
+        substituir_frames(pasta_temp, pasta_saida)
+    else:
+        shutil.rmtree(pasta_temp, ignore_errors=True)
+
+def registrar_exercicio_headless(video_entrada, nome_exercicio, tipo_exercicio, tempo_alongamento, max_poses=None,
+                                 modelo=CONFIG_PADRAO['modelo'], workers=1):
+    landmarks_video, _, fps = obter_landmarks_video(video_entrada, {'modelo': modelo}, workers=workers)
+    angulos, validos = angulos_landmarks_video(landmarks_video)
+    indices = selecionar_poses_chave(angulos, validos, fps, max_poses)
+    if not indices:
+        return nome_exercicio, []
+
+    angulos_3d, validos_3d = angulos_landmarks_video(landmarks_video[indices], '3d')
+    salvar_frames_chave(video_entrada, indices, f"./exercises_input/{nome_exercicio}")
+    gerar_yaml_exercicio(f"./exercises_output/{nome_exercicio}.yaml", tipo_exercicio, tempo_alongamento,
+                         angulos[indices], validos[indices], angulos_3d, validos_3d)
+    return nome_exercicio, indices
+
+def registrar_diretorio(diretorio, tipo_exercicio, tempo_alongamento, max_poses=None, workers=None,
+                        modelo=CONFIG_PADRAO['modelo']):
+    videos = sorted(f for f in os.listdir(diretorio) if f.lower().endswith(EXTENSOES_VIDEO))
+    # o paralelismo e entre videos: cada um e extraido em um unico processo, sem segmentar
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            executor.submit(registrar_exercicio_headless, os.path.join(diretorio, video),
+                            os.path.splitext(video)[0], tipo_exercicio, tempo_alongamento, max_poses, modelo): video
+            for video in videos
+        }
+        for futuro in as_completed(futuros):
+            try:
+                nome, indices = futuro.result()
+            except Exception as e:
+                print(f"Erro ao registrar '{futuros[futuro]}': {e}")
+                continue
+            if indices:
+                print(f"-> {nome}: {len(indices)} pose(s) nos frames {indices}")
+            else:
+                print(f"-> {nome}: nenhuma pose estável encontrada")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Gera o esqueleto de um vídeo e salva frames selecionados.")
-    parser.add_argument('--path', required=True, help='caminho para o vídeo desejado.')
-    parser.add_argument('--exercise_name', required=True, help='Nome do exercício a ser registrado.')
+    entrada = parser.add_mutually_exclusive_group(required=True)
+    entrada.add_argument('--path', help='caminho para o vídeo desejado.')
+    entrada.add_argument('--batch_dir', help='Diretório de vídeos para cadastrar em lote (nome do exercício = nome do arquivo).')
+    parser.add_argument('--exercise_name', help='Nome do exercício a ser registrado.')
     parser.add_argument('--exercise_type', required=True, choices=['braco','perna','braco_e_perna'], help='Tipo do exercício: braco, perna ou braco e perna')
     parser.add_argument('--hold_time', type=int, required=True, help='Tempo em segundos que a pose deve ser mantida em segundos.')
+    parser.add_argument('--headless', action='store_true', help='Cadastro sem interface: escolhe as poses-chave automaticamente.')
+    parser.add_argument('--max_poses', type=int, help='Número máximo de poses-chave no modo headless.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Número de processos: segmentos do vídeo com --path, vídeos com --batch_dir (padrão: núcleos da CPU).')
+    parser.add_argument('--model', choices=TIERS, default=CONFIG_PADRAO['modelo'],
+                        help='Modelo do pose landmarker (use o mesmo do monitor; padrão: full)')
+    parser.add_argument('--show_overlay', action='store_true', help='Exibe o vídeo com o esqueleto enquanto ele é gravado.')
     
     args = parser.parse_args()
-    
+
+    if args.batch_dir:
+        if not os.path.isdir(args.batch_dir):
+            print(f"Erro: O diretório '{args.batch_dir}' não foi encontrado.")
+            sys.exit(1)
+        registrar_diretorio(args.batch_dir, args.exercise_type, args.hold_time, args.max_poses, args.workers, args.model)
+        sys.exit(0)
+
+    if not args.exercise_name:
+        parser.error('--exercise_name é obrigatório com --path')
+
     if not os.path.isfile(args.path):
         print(f"Erro: O arquivo '{args.path}' não foi encontrado.")
         sys.exit(1)
 
     video_entrada = args.path
     nome_exercicio = args.exercise_name
+
+    if args.headless:
+        _, indices = registrar_exercicio_headless(video_entrada, nome_exercicio, args.exercise_type,
+                                                  args.hold_time, args.max_poses, args.model, args.workers)
+        if not indices:
+            print("Nenhuma pose estável encontrada no vídeo.")
+            sys.exit(1)
+        print(f"Exercício '{nome_exercicio}' cadastrado com {len(indices)} pose(s) (frames {indices}).")
+        sys.exit(0)
+
     video_saida = f'./videos_processados/{nome_exercicio}.mp4'
 
-    processar_video(video_entrada, video_saida)
-    selecionar_frames_de_video(video_entrada, video_saida, nome_exercicio)
+    # Inferencia roda so na primeira vez; recadastros do mesmo video leem o cache
+    landmarks_video, _, _ = obter_landmarks_video(video_entrada, {'modelo': args.model}, workers=args.workers)
 
-    # Reaproveita o codigo para calcular os angulos dos frames de um diretorio
-    comando = [
-        'python', './ExerciseDataGenerator.py',
-        '--images_dir', f'./exercises_input/{nome_exercicio}',
-        '--model_type', 'heavy',
-        '--output_file', f'./exercises_output/{nome_exercicio}.yaml',
-        '--tipo_exercicio', args.exercise_type,
-        '--tempo', str(args.hold_time)
-    ]
+    processar_video(video_entrada, video_saida, landmarks_video, args.show_overlay)
+    frames_salvos = selecionar_frames_de_video(video_entrada, nome_exercicio, landmarks_video)
+    if not frames_salvos:
+        print("Nenhum frame selecionado, exercício não cadastrado.")
+        sys.exit(1)
 
-    try:
-        result = subprocess.run(comando, check=True, capture_output=True, text=True)
-        print("Comando executado com sucesso!")
-        print(result.stdout)
-    except subprocess.CalledProcessError as e:
-        print(f"Erro ao executar comando: {e}")
-        print(f"Saída de erro: {e.stderr}")
\ No newline at end of file
+    # Angulos (2D e 3D) dos frames selecionados saem direto do cache de landmarks
+    angulos, validos = angulos_landmarks_video(landmarks_video[frames_salvos])
+    angulos_3d, validos_3d = angulos_landmarks_video(landmarks_video[frames_salvos], '3d')
+    gerar_yaml_exercicio(f'./exercises_output/{nome_exercicio}.yaml', args.exercise_type, args.hold_time,
+                         angulos, validos, angulos_3d, validos_3d)
+    print(f"Exercício salvo em './exercises_output/{nome_exercicio}.yaml'")
@@ -0,0 +1,125 @@
+### Reproducao de sessoes gravadas pelo monitor (SessionRecording): re-avalia a sessao com a
+### maquina de estados atual, re-renderiza o esqueleto e os stats em um video, ou gera um
+### relatorio de progresso de varias sessoes. Nada espera o tempo real da sessao.
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from DrawingUtils import draw_skeleton_array, draw_stats
+from ExerciseStore import carregar_exercicio
+from FilterUtils import FILTROS
+from GeometryUtils import PRESENCE_THRESHOLD, TRIPLETOS_ANGULOS
+from ScoreVideo import avaliar_angulos, avaliar_landmarks, salvar_log
+from SessionRecording import DIR_SESSOES, carregar_metadados, carregar_sessao, listar_sessoes, resumir_sessao
+
+
+def landmarks_para_video(landmarks):
+    # (F, 33, 4) gravado -> (F, 33, 5) com as colunas 2D do LandmarkCache (a visibilidade nao e
+    # gravada: usa a presenca)
+    return landmarks[..., [0, 1, 2, 3, 3]]
+
+
+# Roda a sessao gravada de novo pela maquina de estados (ex.: apos mudar o filtro, o limite de
+# erro ou as poses de referencia) e devolve o mesmo log por frame do ScoreVideo.
+# Sessoes em modo 3d usam os angulos gravados: os pose_world_landmarks nao entram na gravacao.
+def reavaliar_sessao(diretorio, nome_exercicio=None, filtro='one_euro'):
+    metadados = carregar_metadados(diretorio)
+    modo = metadados.get('modo_angulos', '2d')
+    exercicio = carregar_exercicio(nome_exercicio or metadados['exercicio'], modo=modo)
+    if modo == '3d':
+        dados = carregar_sessao(diretorio, ['timestamp_ms', 'detectado', 'angulos', 'validos'])
+        return avaliar_angulos(exercicio, dados['angulos'], dados['validos'], dados['detectado'],
+                               dados['timestamp_ms'], filtro)
+    dados = carregar_sessao(diretorio, ['timestamp_ms', 'landmarks'])
+    return avaliar_landmarks(exercicio, landmarks_para_video(dados['landmarks']), dados['timestamp_ms'], filtro)
+
+
+# Re-renderiza a sessao (esqueleto com os tripletos errados e os stats gravados) em um video
+def renderizar_sessao(diretorio, video_saida, tamanho=(1280, 720)):
+    metadados = carregar_metadados(diretorio)
+    dados = carregar_sessao(diretorio)
+    timestamps = dados['timestamp_ms']
+    intervalos = np.diff(timestamps)
+    fps = 1000 / float(np.median(intervalos)) if len(intervalos) and np.median(intervalos) > 0 else 30.0
+
+    largura, altura = tamanho
+    escritor = cv2.VideoWriter(video_saida, cv2.VideoWriter_fourcc(*'mp4v'), fps, (largura, altura))
+    frame = np.zeros((altura, largura, 3), dtype=np.uint8)
+    for i in range(len(timestamps)):
+        frame[:] = 0
+        if dados['detectado'][i]:
+            pontos = dados['landmarks'][i]
+            errados = [TRIPLETOS_ANGULOS[t] for t in np.flatnonzero(dados['tripletos_errados'][i])]
+            draw_skeleton_array(frame, pontos, pontos[:, 3] >= PRESENCE_THRESHOLD, errados)
+        # o monitor mostra a imagem espelhada; os stats sao desenhados depois do espelhamento
+        cv2.flip(frame, 1, dst=frame)
+        draw_stats(frame, int(dados['pose_index'][i]), metadados.get('num_poses', 0), int(dados['reps'][i]),
+                   float(dados['timer_alongamento'][i]), altura / 720)
+        escritor.write(frame)
+    escritor.release()
+    return len(timestamps), fps
+
+
+def imprimir_resumo(resumo):
+    rmse = f"{resumo['rmse_medio']:6.2f}" if resumo['rmse_medio'] is not None else "     -"
+    print(f"  {resumo['sessao']:<40} {resumo['duracao_s']:8.1f}s  reps {resumo['reps']:3d}  "
+          f"poses {resumo['poses_concluidas']:3d}  deteccao {resumo['deteccao']:6.1%}  "
+          f"alongando {resumo['tempo_alongando_s']:7.1f}s  rmse medio {rmse}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reproduz, re-avalia ou resume sessões gravadas pelo monitor.")
+    entrada = parser.add_mutually_exclusive_group(required=True)
+    entrada.add_argument('--path', help='Diretório de uma sessão gravada.')
+    entrada.add_argument('--sessions_dir', nargs='?', const=DIR_SESSOES,
+                         help=f'Relatório de progresso de todas as sessões do diretório (padrão: {DIR_SESSOES}).')
+    parser.add_argument('--exercise_name', help='Exercício usado na re-avaliação / filtro do relatório.')
+    parser.add_argument('--rescore', action='store_true', help='Re-avalia a sessão com a máquina de estados atual.')
+    parser.add_argument('--filter', choices=FILTROS, default='one_euro', help='Filtro temporal usado na re-avaliação.')
+    parser.add_argument('--render', help='Re-renderiza a sessão neste vídeo (.mp4).')
+    parser.add_argument('--output', help='Salva o log da re-avaliação ou o relatório (.csv ou .json).')
+    args = parser.parse_args()
+
+    if args.sessions_dir:
+        sessoes = listar_sessoes(args.sessions_dir)
+        resumos = [resumir_sessao(s) for s in sessoes]
+        if args.exercise_name:
+            resumos = [r for r in resumos if r['exercicio'] == args.exercise_name]
+        if not resumos:
+            print(f"Nenhuma sessão gravada em '{args.sessions_dir}'.")
+            sys.exit(1)
+        for exercicio in sorted({r['exercicio'] for r in resumos}):
+            do_exercicio = [r for r in resumos if r['exercicio'] == exercicio]
+            print(f"\n{exercicio} ({len(do_exercicio)} sessões, {sum(r['reps'] for r in do_exercicio)} reps)")
+            for resumo in do_exercicio:
+                imprimir_resumo(resumo)
+        if args.output:
+            salvar_log(resumos, args.output)
+            print(f"\nRelatório salvo em '{args.output}'")
+        sys.exit(0)
+
+    if not os.path.isdir(args.path):
+        print(f"Erro: A sessão '{args.path}' não foi encontrada.")
+        sys.exit(1)
+
+    imprimir_resumo(resumir_sessao(args.path))
+
+    if args.rescore:
+        inicio = time.perf_counter()
+        log = reavaliar_sessao(args.path, args.exercise_name, args.filter)
+        duracao = time.perf_counter() - inicio
+        reps = log[-1]['reps'] if log else 0
+        print(f"Re-avaliação: {reps} rep(s) em {len(log)} frames ({duracao:.2f}s)")
+        if args.output:
+            salvar_log(log, args.output)
+            print(f"Log salvo em '{args.output}'")
+
+    if args.render:
+        inicio = time.perf_counter()
+        num_frames, fps = renderizar_sessao(args.path, args.render)
+        print(f"{num_frames} frames renderizados a {fps:.1f} fps em '{args.render}' "
+              f"({time.perf_counter() - inicio:.2f}s)")
@@ -0,0 +1,74 @@
+### Inferencia recortada: usa a caixa da pose do frame anterior (com margem) para rodar o
+### landmarker so nessa regiao, e devolve os landmarks em coordenadas normalizadas do frame inteiro
+import cv2
+import numpy as np
+
+from GeometryUtils import PRESENCE_THRESHOLD, TRIPLETOS
+
+# landmarks usados no calculo dos angulos: e a presenca deles que decide se o recorte ainda serve
+_LANDMARKS_TRIPLETOS = np.unique(TRIPLETOS)
+
+
+class RastreadorROI:
+    # margem: fracao do tamanho da caixa adicionada de cada lado
+    # lado_max: se definido, o recorte e reduzido para que o maior lado tenha no maximo esse tamanho
+    # tamanho_min: fracao minima do frame ocupada pela caixa (evita recortes minusculos)
+    def __init__(self, margem=0.25, lado_max=None, tamanho_min=0.2, presence_threshold=PRESENCE_THRESHOLD):
+        self.margem = margem
+        self.lado_max = lado_max
+        self.tamanho_min = tamanho_min
+        self.presence_threshold = presence_threshold
+        self.caixa = None   # (x0, y0, x1, y1) em pixels do frame; None = frame inteiro
+
+    # Retorna a imagem que vai para o landmarker (ja em RGB) e a caixa usada para gera-la
+    def preparar(self, frame):
+        caixa = self.caixa
+        recorte = frame if caixa is None else frame[caixa[1]:caixa[3], caixa[0]:caixa[2]]
+        if self.lado_max is not None and max(recorte.shape[:2]) > self.lado_max:
+            fator = self.lado_max / max(recorte.shape[:2])
+            recorte = cv2.resize(recorte, (max(1, int(recorte.shape[1] * fator)), max(1, int(recorte.shape[0] * fator))),
+                                 interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(recorte, cv2.COLOR_BGR2RGB), caixa
+
+    # Converte (in-place) os landmarks do resultado para o frame inteiro e atualiza a caixa
+    # para o proximo frame. Sem pose, ou com presenca baixa, volta para o frame inteiro.
+    def processar_resultado(self, result, caixa, formato_frame):
+        altura, largura = formato_frame[:2]
+        if not result.pose_landmarks:
+            self.caixa = None
+            return
+
+        landmarks = result.pose_landmarks[0]
+        if caixa is not None:
+            x0, y0, x1, y1 = caixa
+            escala_x = (x1 - x0) / largura
+            escala_y = (y1 - y0) / altura
+            for lm in landmarks:
+                lm.x = x0 / largura + lm.x * escala_x
+                lm.y = y0 / altura + lm.y * escala_y
+                lm.z = lm.z * escala_x   # z usa a mesma escala de x no mediapipe
+
+        presencas = np.array([lm.presence or 0.0 for lm in landmarks], dtype=np.float32)
+        if presencas[_LANDMARKS_TRIPLETOS].mean() < self.presence_threshold:
+            self.caixa = None
+            return
+
+        validos = presencas >= self.presence_threshold
+        xs = np.array([lm.x for lm in landmarks], dtype=np.float32)[validos]
+        ys = np.array([lm.y for lm in landmarks], dtype=np.float32)[validos]
+        self.caixa = self._caixa_com_margem(xs.min(), ys.min(), xs.max(), ys.max(), largura, altura)
+
+    def _caixa_com_margem(self, x0, y0, x1, y1, largura, altura):
+        # coordenadas normalizadas -> pixels, com margem e tamanho minimo, limitadas ao frame
+        meia_largura = max((x1 - x0) * (0.5 + self.margem), self.tamanho_min / 2)
+        meia_altura = max((y1 - y0) * (0.5 + self.margem), self.tamanho_min / 2)
+        centro_x, centro_y = (x0 + x1) / 2, (y0 + y1) / 2
+        caixa = (
+            int(max(0.0, centro_x - meia_largura) * largura),
+            int(max(0.0, centro_y - meia_altura) * altura),
+            int(min(1.0, centro_x + meia_largura) * largura),
+            int(min(1.0, centro_y + meia_altura) * altura),
+        )
+        if caixa[2] - caixa[0] < 2 or caixa[3] - caixa[1] < 2:
+            return None
+        return caixa
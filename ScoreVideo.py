@@ -0,0 +1,130 @@
+### Avaliacao offline: roda a mesma maquina de estados do monitor sobre um video gravado, sem
+### exibicao e sem esperar o tempo real, e gera um log por frame em CSV ou JSON
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from AdaptiveInference import TIERS
+from ExerciseSession import SessaoExercicio
+from ExerciseStore import carregar_exercicio, compilar_exercicio
+from FilterUtils import FILTROS, criar_filtro
+from GeometryUtils import CHAVES_TRIPLETOS, MODOS_ANGULO
+from LandmarkCache import CONFIG_PADRAO, EXTENSOES_VIDEO, obter_landmarks_video, angulos_landmarks_video
+
+
+# Angulos ja calculados (F, T) -> log por frame; o exercicio precisa ser do mesmo modo (2d/3d)
+def avaliar_angulos(exercicio, angulos, validos, detectados, timestamps, filtro='one_euro'):
+    sessao = SessaoExercicio(exercicio, filtro=criar_filtro(filtro, angulos.shape[1]))
+    log = []
+
+    for i, timestamp_ms in enumerate(timestamps):
+        pose_concluida = False
+        # igual ao monitor: sem pose detectada o estado da sessao fica congelado
+        if detectados[i]:
+            pose_concluida = sessao.atualizar(angulos[i], validos[i], timestamp_ms / 1000)
+
+        linha = {
+            'frame': i,
+            'timestamp_ms': round(float(timestamp_ms), 3),
+            'detectado': bool(detectados[i]),
+        }
+        for t, chave in enumerate(CHAVES_TRIPLETOS):
+            linha[chave] = round(float(angulos[i, t]), 3) if validos[i, t] else None
+        linha.update({
+            'rmse': None if sessao.rmse is None or not detectados[i] else round(sessao.rmse, 3),
+            'pose_correta': bool(sessao.pose_correta) if detectados[i] else False,
+            'pose_index': sessao.pose_index,
+            'reps': sessao.reps,
+            'timer_alongamento': round(sessao.timer_alongamento, 3),
+            'pose_concluida': pose_concluida,
+        })
+        log.append(linha)
+    return log
+
+
+def avaliar_landmarks(exercicio, landmarks_video, timestamps, filtro='one_euro'):
+    angulos, validos = angulos_landmarks_video(landmarks_video, exercicio.modo)
+    detectados = np.isfinite(landmarks_video[:, 0, 0])
+    return avaliar_angulos(exercicio, angulos, validos, detectados, timestamps, filtro)
+
+
+def salvar_log(log, caminho_saida):
+    os.makedirs(os.path.dirname(caminho_saida) or '.', exist_ok=True)
+    if caminho_saida.endswith('.json'):
+        with open(caminho_saida, 'w') as f:
+            json.dump(log, f)
+        return
+    with open(caminho_saida, 'w', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(log[0].keys()) if log else ['frame'])
+        escritor.writeheader()
+        escritor.writerows(log)
+
+
+# modelo: o mesmo do cadastro e do monitor, para os angulos da sessao serem comparaveis com a referencia
+def avaliar_video(video_entrada, nome_exercicio, caminho_saida, filtro='one_euro', modo='2d',
+                  modelo=CONFIG_PADRAO['modelo']):
+    exercicio = carregar_exercicio(nome_exercicio, modo=modo)
+    landmarks_video, timestamps, _ = obter_landmarks_video(video_entrada, {'modelo': modelo})
+    log = avaliar_landmarks(exercicio, landmarks_video, timestamps, filtro)
+    salvar_log(log, caminho_saida)
+    return caminho_saida, (log[-1]['reps'] if log else 0), len(log)
+
+
+def avaliar_diretorio(diretorio, nome_exercicio, dir_saida, formato='csv', workers=None, filtro='one_euro',
+                      modo='2d', modelo=CONFIG_PADRAO['modelo']):
+    # compila o exercicio antes de criar os processos, para nao compilar o mesmo YAML em paralelo
+    compilar_exercicio(nome_exercicio)
+    videos = sorted(f for f in os.listdir(diretorio) if f.lower().endswith(EXTENSOES_VIDEO))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            executor.submit(avaliar_video, os.path.join(diretorio, video), nome_exercicio,
+                            os.path.join(dir_saida, f"{os.path.splitext(video)[0]}.{formato}"), filtro, modo, modelo): video
+            for video in videos
+        }
+        for futuro in as_completed(futuros):
+            try:
+                caminho, reps, num_frames = futuro.result()
+            except Exception as e:
+                print(f"Erro ao avaliar '{futuros[futuro]}': {e}")
+                continue
+            print(f"-> {futuros[futuro]}: {reps} rep(s) em {num_frames} frames, log em '{caminho}'")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Avalia offline a execução de um exercício em vídeos gravados.")
+    entrada = parser.add_mutually_exclusive_group(required=True)
+    entrada.add_argument('--path', help='Vídeo da sessão a ser avaliada.')
+    entrada.add_argument('--sessions_dir', help='Diretório com vídeos de sessões para avaliar em paralelo.')
+    parser.add_argument('--exercise_name', required=True, help='Nome do exercício cadastrado (em exercises_output).')
+    parser.add_argument('--output', help='Arquivo de log (.csv ou .json) ao avaliar um único vídeo.')
+    parser.add_argument('--output_dir', default='./sessoes_avaliadas', help='Diretório dos logs ao avaliar um diretório.')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv', help='Formato dos logs ao avaliar um diretório.')
+    parser.add_argument('--workers', type=int, help='Número de processos (padrão: núcleos da CPU).')
+    parser.add_argument('--filter', choices=FILTROS, default='one_euro', help='Filtro temporal dos ângulos (igual ao monitor).')
+    parser.add_argument('--angles', choices=MODOS_ANGULO, default='2d',
+                        help='Ângulos 2D (imagem) ou 3D (pose_world_landmarks) na comparação (padrão: 2d).')
+    parser.add_argument('--model', choices=TIERS, default=CONFIG_PADRAO['modelo'],
+                        help='Modelo do pose landmarker (use o mesmo do cadastro; padrão: full)')
+    args = parser.parse_args()
+
+    if args.sessions_dir:
+        if not os.path.isdir(args.sessions_dir):
+            print(f"Erro: O diretório '{args.sessions_dir}' não foi encontrado.")
+            sys.exit(1)
+        avaliar_diretorio(args.sessions_dir, args.exercise_name, args.output_dir, args.format, args.workers,
+                          args.filter, args.angles, args.model)
+        sys.exit(0)
+
+    if not os.path.isfile(args.path):
+        print(f"Erro: O arquivo '{args.path}' não foi encontrado.")
+        sys.exit(1)
+
+    saida = args.output or os.path.join(args.output_dir, f"{os.path.splitext(os.path.basename(args.path))[0]}.csv")
+    caminho, reps, num_frames = avaliar_video(args.path, args.exercise_name, saida, args.filter, args.angles,
+                                               args.model)
+    print(f"{reps} rep(s) em {num_frames} frames. Log salvo em '{caminho}'")
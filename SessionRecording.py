@@ -0,0 +1,248 @@
+### Gravacao de sessoes do monitor em colunas: cada frame exibido (landmarks, presenca, angulos,
+### RMSE, tripletos errados, pose, repeticoes e timer) entra em buffers pre-alocados e, a cada
+### CHUNK_FRAMES frames, uma thread grava o bloco como um .npz comprimido (append-only: um arquivo
+### por bloco, entao uma sessao interrompida continua legivel ate o ultimo bloco gravado)
+import datetime
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from GeometryUtils import CHAVES_TRIPLETOS, INDICE_CHAVE, NUM_LANDMARKS, NUM_TRIPLETOS
+
+DIR_SESSOES = "sessoes_gravadas"
+VERSAO_FORMATO = 1
+CHUNK_FRAMES = 900            # ~30 s a 30 fps por bloco
+ESCALA_COORDENADAS = 4096     # landmarks em int16 com 1/4096 de resolucao (coordenadas normalizadas)
+ESCALA_ANGULOS = 100          # angulos (0-180 graus) em int16 com centesimos de grau
+ARQUIVO_METADADOS = "sessao.json"
+
+# Colunas gravadas em cada bloco: nome -> (dtype, formato por frame)
+COLUNAS = {
+    'timestamp_ms': (np.float64, ()),
+    'detectado': (np.bool_, ()),
+    'landmarks': (np.int16, (NUM_LANDMARKS, 3)),       # x, y, z quantizados (delta no tempo)
+    'presence': (np.uint8, (NUM_LANDMARKS,)),          # presence * 255
+    'angulos': (np.int16, (NUM_TRIPLETOS,)),            # quantizados (delta no tempo)
+    'validos': (np.bool_, (NUM_TRIPLETOS,)),
+    'rmse': (np.float16, ()),                          # NaN quando nada foi comparado
+    'tripletos_errados': (np.bool_, (NUM_TRIPLETOS,)),
+    'pose_index': (np.int16, ()),
+    'reps': (np.int32, ()),
+    'timer_alongamento': (np.float32, ()),
+    'pose_concluida': (np.bool_, ()),
+}
+COLUNAS_DELTA = ('landmarks', 'angulos')
+
+
+# Colunas quantizadas viram diferencas entre frames seguidos, com o tempo no ultimo eixo: landmarks
+# que mudam pouco de um frame para o outro geram bytes repetidos que o zlib comprime muito melhor.
+# A aritmetica em int16 da a volta no overflow, e o cumsum em int16 desfaz exatamente.
+def _codificar_delta(valores):
+    delta = np.diff(valores, axis=0, prepend=np.zeros_like(valores[:1]))
+    return np.ascontiguousarray(np.moveaxis(delta, 0, -1))
+
+
+def _decodificar_delta(delta):
+    return np.cumsum(np.moveaxis(delta, -1, 0), axis=0, dtype=np.int16)
+
+
+def _novos_buffers(tamanho):
+    return {nome: np.zeros((tamanho,) + formato, dtype=dtype) for nome, (dtype, formato) in COLUNAS.items()}
+
+
+def _escrever_json(caminho, dados):
+    temporario = caminho + ".tmp"
+    with open(temporario, 'w') as f:
+        json.dump(dados, f, indent=2)
+    os.replace(temporario, caminho)
+
+
+class GravadorSessao:
+    # registrar() so copia os valores do frame para os buffers; a compressao e a escrita em disco
+    # ficam na thread de escrita. Ao contrario da FilaRecente, a fila de blocos nunca descarta.
+    def __init__(self, diretorio, metadados, chunk_frames=CHUNK_FRAMES):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.chunk_frames = chunk_frames
+        self.metadados = dict(metadados)
+        self.metadados.update({
+            'versao': VERSAO_FORMATO,
+            'inicio': datetime.datetime.now().isoformat(timespec='seconds'),
+            'tripletos': CHAVES_TRIPLETOS,
+            'escala_coordenadas': ESCALA_COORDENADAS,
+            'escala_angulos': ESCALA_ANGULOS,
+            'chunk_frames': chunk_frames,
+        })
+        _escrever_json(os.path.join(diretorio, ARQUIVO_METADADOS), self.metadados)
+
+        self.num_frames = 0
+        self._buffers = _novos_buffers(chunk_frames)
+        self._n = 0
+        self._num_chunks = 0
+        self._fila = queue.Queue()
+        self.erro = None
+        self._thread = threading.Thread(target=self._loop_escrita, name="gravador_sessao", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def para_exercicio(cls, exercicio, dir_sessoes=DIR_SESSOES, extras=None, chunk_frames=CHUNK_FRAMES):
+        nome = f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{exercicio.nome}"
+        metadados = {
+            'exercicio': exercicio.nome,
+            'tipo_exercicio': exercicio.tipo_exercicio,
+            'tempo_alongamento': exercicio.tempo_alongamento,
+            'num_poses': exercicio.num_poses,
+            'modo_angulos': exercicio.modo,      # angulos gravados: 2d (imagem) ou 3d (pose_world_landmarks)
+        }
+        metadados.update(extras or {})
+        return cls(os.path.join(dir_sessoes, nome), metadados, chunk_frames)
+
+    # Um frame exibido. pontos (33, 4) = [x, y, z, presence] e angulos/validos (T,) ficam None
+    # quando nenhuma pose foi detectada; o estado vem da sessao (ExerciseSession.SessaoExercicio)
+    def registrar(self, timestamp_ms, sessao, pontos=None, angulos=None, validos=None, pose_concluida=False):
+        b, i = self._buffers, self._n
+        b['timestamp_ms'][i] = timestamp_ms
+        b['detectado'][i] = pontos is not None
+        if pontos is not None:
+            b['landmarks'][i] = np.clip(np.rint(np.nan_to_num(pontos[:, :3]) * ESCALA_COORDENADAS), -32767, 32767)
+            b['presence'][i] = np.rint(np.clip(pontos[:, 3], 0.0, 1.0) * 255)
+            b['angulos'][i] = np.rint(np.nan_to_num(angulos) * ESCALA_ANGULOS)
+            b['validos'][i] = validos
+            b['rmse'][i] = np.nan if sessao.rmse is None else sessao.rmse
+            b['tripletos_errados'][i] = False
+            for tripleto in sessao.tripletos_errados:
+                b['tripletos_errados'][i, INDICE_CHAVE["-".join(map(str, tripleto))]] = True
+        else:
+            # sem deteccao: repete os landmarks anteriores (delta zero) e marca tudo como invalido
+            b['landmarks'][i] = b['landmarks'][i - 1] if i else 0
+            b['angulos'][i] = b['angulos'][i - 1] if i else 0
+            b['presence'][i] = 0
+            b['validos'][i] = False
+            b['rmse'][i] = np.nan
+            b['tripletos_errados'][i] = False
+        b['pose_index'][i] = sessao.pose_index
+        b['reps'][i] = sessao.reps
+        b['timer_alongamento'][i] = sessao.timer_alongamento
+        b['pose_concluida'][i] = pose_concluida
+
+        self._n += 1
+        self.num_frames += 1
+        if self._n == self.chunk_frames:
+            self._enviar_bloco()
+
+    def _enviar_bloco(self):
+        if self._n:
+            self._fila.put((self._num_chunks, self._buffers, self._n))
+            self._num_chunks += 1
+            self._buffers = _novos_buffers(self.chunk_frames)
+            self._n = 0
+
+    def _loop_escrita(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            indice, buffers, n = item
+            try:
+                colunas = {nome: buffers[nome][:n] for nome in COLUNAS}
+                for nome in COLUNAS_DELTA:
+                    colunas[nome] = _codificar_delta(colunas[nome])
+                caminho = os.path.join(self.diretorio, f"chunk_{indice:05d}.npz")
+                temporario = caminho + ".tmp.npz"
+                np.savez_compressed(temporario, **colunas)
+                os.replace(temporario, caminho)
+            except Exception as e:   # nao derruba o monitor; o erro fica disponivel para quem fechar
+                self.erro = e
+
+    # Grava o bloco parcial, espera a thread de escrita e completa os metadados
+    def fechar(self):
+        self._enviar_bloco()
+        self._fila.put(None)
+        self._thread.join()
+        self.metadados.update({
+            'fim': datetime.datetime.now().isoformat(timespec='seconds'),
+            'num_frames': self.num_frames,
+            'num_chunks': self._num_chunks,
+        })
+        _escrever_json(os.path.join(self.diretorio, ARQUIVO_METADADOS), self.metadados)
+        if self.erro is not None:
+            print(f"Erro ao gravar a sessão em '{self.diretorio}': {self.erro}")
+
+
+def listar_sessoes(dir_sessoes=DIR_SESSOES):
+    if not os.path.isdir(dir_sessoes):
+        return []
+    return [os.path.join(dir_sessoes, d) for d in sorted(os.listdir(dir_sessoes))
+            if os.path.isfile(os.path.join(dir_sessoes, d, ARQUIVO_METADADOS))]
+
+
+def carregar_metadados(diretorio):
+    with open(os.path.join(diretorio, ARQUIVO_METADADOS)) as f:
+        return json.load(f)
+
+
+# Le as colunas pedidas (todas se colunas=None) de todos os blocos gravados, ja decodificadas:
+# landmarks em float32 (F, 33, 4) = [x, y, z, presence] com NaN nos frames sem deteccao,
+# angulos em float32 com NaN nos invalidos e rmse em float32. O npz so descomprime as
+# colunas acessadas, entao consultas que leem poucas colunas sao rapidas mesmo em sessoes longas.
+def carregar_sessao(diretorio, colunas=None):
+    colunas = list(COLUNAS) if colunas is None else list(colunas)
+    lidas = set(colunas)
+    if 'landmarks' in lidas:
+        lidas.update(('presence', 'detectado'))
+    if 'angulos' in lidas:
+        lidas.add('validos')
+
+    blocos = {nome: [] for nome in lidas}
+    chunks = sorted(f for f in os.listdir(diretorio) if f.startswith("chunk_") and f.endswith(".npz")
+                    and not f.endswith(".tmp.npz"))
+    for chunk in chunks:
+        with np.load(os.path.join(diretorio, chunk)) as dados:
+            for nome in lidas:
+                valores = dados[nome]
+                blocos[nome].append(_decodificar_delta(valores) if nome in COLUNAS_DELTA else valores)
+
+    dados = {}
+    for nome in lidas:
+        dtype, formato = COLUNAS[nome]
+        dados[nome] = np.concatenate(blocos[nome]) if blocos[nome] else np.zeros((0,) + formato, dtype=dtype)
+
+    resultado = {nome: dados[nome] for nome in colunas}
+    if 'landmarks' in resultado:
+        pontos = np.empty(dados['landmarks'].shape[:2] + (4,), dtype=np.float32)
+        pontos[..., :3] = dados['landmarks'] / ESCALA_COORDENADAS
+        pontos[..., 3] = dados['presence'] / 255
+        pontos[~dados['detectado']] = np.nan
+        resultado['landmarks'] = pontos
+    if 'angulos' in resultado:
+        resultado['angulos'] = np.where(dados['validos'], dados['angulos'] / ESCALA_ANGULOS, np.nan).astype(np.float32)
+    if 'rmse' in resultado:
+        resultado['rmse'] = resultado['rmse'].astype(np.float32)
+    return resultado
+
+
+# Resumo de uma sessao para relatorios de progresso (le so as colunas necessarias)
+def resumir_sessao(diretorio):
+    metadados = carregar_metadados(diretorio)
+    dados = carregar_sessao(diretorio, ['timestamp_ms', 'detectado', 'rmse', 'reps', 'timer_alongamento',
+                                        'pose_concluida'])
+    timestamps = dados['timestamp_ms']
+    rmse = dados['rmse'][dados['detectado']]
+    rmse = rmse[np.isfinite(rmse)]
+    intervalos = np.diff(timestamps, prepend=timestamps[:1]) / 1000
+    return {
+        'sessao': os.path.basename(diretorio),
+        'exercicio': metadados.get('exercicio'),
+        'inicio': metadados.get('inicio'),
+        'duracao_s': round(float(timestamps[-1] - timestamps[0]) / 1000, 1) if len(timestamps) else 0.0,
+        'frames': int(len(timestamps)),
+        'deteccao': round(float(dados['detectado'].mean()), 3) if len(timestamps) else 0.0,
+        'reps': int(dados['reps'][-1]) if len(timestamps) else 0,
+        'poses_concluidas': int(dados['pose_concluida'].sum()),
+        'tempo_alongando_s': round(float(intervalos[dados['timer_alongamento'] > 0].sum()), 1),
+        'rmse_medio': round(float(rmse.mean()), 2) if len(rmse) else None,
+        'rmse_mediano': round(float(np.median(rmse)), 2) if len(rmse) else None,
+    }
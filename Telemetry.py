@@ -0,0 +1,225 @@
+### Telemetria por estagio do monitor: spans de tempo alimentam histogramas em memoria
+### (p50/p95/p99), exportados periodicamente em JSONL e/ou por um endpoint HTTP no formato
+### texto do Prometheus. Desativada, cada span custa so uma chamada a um objeto nulo.
+### Tambem mede os marcos da inicializacao do monitor (MarcosInicializacao).
+import bisect
+import json
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# limites dos buckets em ms, em progressao geometrica de 0.01 ms ate ~1 min
+LIMITES_BUCKETS = [0.01 * 1.25 ** i for i in range(71)]
+QUANTIS = (0.5, 0.95, 0.99)
+
+
+class Histograma:
+    def __init__(self):
+        self._contagens = [0] * (len(LIMITES_BUCKETS) + 1)
+        self._lock = threading.Lock()
+        self.total = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, duracao_ms):
+        i = bisect.bisect_left(LIMITES_BUCKETS, duracao_ms)
+        with self._lock:
+            self._contagens[i] += 1
+            self.total += 1
+            self.soma += duracao_ms
+            if duracao_ms > self.maximo:
+                self.maximo = duracao_ms
+
+    # Quantil aproximado pelo limite superior do bucket onde ele cai
+    def quantil(self, q):
+        with self._lock:
+            if not self.total:
+                return 0.0
+            alvo = q * self.total
+            acumulado = 0
+            for i, contagem in enumerate(self._contagens):
+                acumulado += contagem
+                if acumulado >= alvo:
+                    return LIMITES_BUCKETS[i] if i < len(LIMITES_BUCKETS) else self.maximo
+            return self.maximo
+
+    def resumo(self):
+        resumo = {'count': self.total, 'mean': self.soma / self.total if self.total else 0.0, 'max': self.maximo}
+        for q in QUANTIS:
+            resumo[f'p{int(q * 100)}'] = self.quantil(q)
+        return resumo
+
+
+class _Span:
+    __slots__ = ('_histograma', '_inicio')
+
+    def __init__(self, histograma):
+        self._histograma = histograma
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histograma.registrar((time.perf_counter() - self._inicio) * 1000)
+        return False
+
+
+class Telemetria:
+    ativa = True
+
+    def __init__(self):
+        self._histogramas = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._servidor = None
+        self._exportador = None
+
+    def _histograma(self, estagio):
+        histograma = self._histogramas.get(estagio)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(estagio, Histograma())
+        return histograma
+
+    def span(self, estagio):
+        return _Span(self._histograma(estagio))
+
+    def registrar(self, estagio, duracao_ms):
+        self._histograma(estagio).registrar(duracao_ms)
+
+    def resumo(self):
+        return {estagio: h.resumo() for estagio, h in list(self._histogramas.items())}
+
+    def _escrever_jsonl(self, arquivo):
+        arquivo.write(json.dumps({'timestamp': time.time(), 'estagios': self.resumo()}) + '\n')
+        arquivo.flush()
+
+    def exportar_jsonl(self, caminho):
+        with open(caminho, 'a') as f:
+            self._escrever_jsonl(f)
+
+    # O arquivo e aberto aqui (erro de caminho aparece no inicio) e fechado pela propria thread
+    # depois do ultimo registro; fechar() espera essa thread terminar.
+    def iniciar_exportacao_jsonl(self, caminho, intervalo=10.0):
+        arquivo = open(caminho, 'a')
+
+        def loop():
+            with arquivo:
+                while not self._parar.wait(intervalo):
+                    self._escrever_jsonl(arquivo)
+                self._escrever_jsonl(arquivo)   # ultimo registro ao encerrar
+
+        self._exportador = threading.Thread(target=loop, name="telemetria_jsonl", daemon=True)
+        self._exportador.start()
+
+    def texto_prometheus(self):
+        linhas = ['# HELP physio_stage_ms Tempo por estagio do monitor em milissegundos',
+                  '# TYPE physio_stage_ms summary']
+        for estagio, resumo in self.resumo().items():
+            for q in QUANTIS:
+                linhas.append(f'physio_stage_ms{{stage="{estagio}",quantile="{q}"}} {resumo[f"p{int(q * 100)}"]:.4f}')
+            linhas.append(f'physio_stage_ms_sum{{stage="{estagio}"}} {resumo["mean"] * resumo["count"]:.4f}')
+            linhas.append(f'physio_stage_ms_count{{stage="{estagio}"}} {resumo["count"]}')
+        return '\n'.join(linhas) + '\n'
+
+    # Endpoint local (GET /metrics) no formato texto do Prometheus
+    def servir_prometheus(self, porta, host='127.0.0.1'):
+        telemetria = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                corpo = telemetria.texto_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer((host, porta), Handler)
+        threading.Thread(target=self._servidor.serve_forever, name="telemetria_http", daemon=True).start()
+
+    def fechar(self, timeout=2.0):
+        self._parar.set()
+        if self._exportador is not None:
+            self._exportador.join(timeout)
+        if self._servidor is not None:
+            self._servidor.shutdown()
+
+
+class TelemetriaNula:
+    # Usada quando a telemetria esta desligada: nenhum relogio e lido, nada e guardado
+    ativa = False
+    _span_nulo = nullcontext()
+
+    def span(self, estagio):
+        return self._span_nulo
+
+    def registrar(self, estagio, duracao_ms):
+        pass
+
+    def resumo(self):
+        return {}
+
+    def fechar(self):
+        pass
+
+
+TELEMETRIA_NULA = TelemetriaNula()
+
+
+class MarcosInicializacao:
+    # Tempo de inicializacao do monitor: marcos (segundos desde `inicio`) e a duracao de cada
+    # tarefa de inicializacao, que podem rodar em paralelo em outras threads
+    def __init__(self, inicio=None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.marcos = {}
+        self.tarefas = {}     # nome -> (duracao, concluida_em)
+        self.espera_usuario = 0.0   # tempo parado em prompts (ex.: menu), descontado do total
+        self._lock = threading.Lock()
+
+    def marcar(self, nome):
+        with self._lock:
+            self.marcos.setdefault(nome, time.perf_counter() - self.inicio)
+
+    # Envolve funcao para registrar quanto ela levou, em qualquer thread que a execute
+    def tarefa(self, nome, funcao):
+        def executar(*args, **kwargs):
+            comeco = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                fim = time.perf_counter()
+                with self._lock:
+                    self.tarefas[nome] = (fim - comeco, fim - self.inicio)
+        return executar
+
+    def resumo(self):
+        with self._lock:
+            return {
+                'marcos': {nome: round(t, 4) for nome, t in sorted(self.marcos.items(), key=lambda m: m[1])},
+                'tarefas': {nome: {'duracao_s': round(d, 4), 'concluida_em_s': round(c, 4)}
+                            for nome, (d, c) in self.tarefas.items()},
+                'espera_usuario_s': round(self.espera_usuario, 4),
+            }
+
+    def relatorio(self):
+        resumo = self.resumo()
+        linhas = ["Inicializacao (segundos desde o inicio do processo):"]
+        linhas += [f"  {nome:<24} {t:8.3f}" for nome, t in resumo['marcos'].items()]
+        linhas += [f"  tarefa {nome:<17} {dados['duracao_s']:8.3f}  (pronta em {dados['concluida_em_s']:.3f})"
+                   for nome, dados in resumo['tarefas'].items()]
+        if resumo['espera_usuario_s']:
+            linhas.append(f"  espera do usuario        {resumo['espera_usuario_s']:8.3f}  (ja incluida nos marcos acima)")
+        return '\n'.join(linhas)
+
+    def exportar_jsonl(self, caminho):
+        with open(caminho, 'a') as f:
+            f.write(json.dumps({'timestamp': time.time(), 'inicializacao': self.resumo()}) + '\n')